@@ -1,5 +1,7 @@
 from src.entities.uav_entities import Drone
 from src.mac_protocol.depot_mac import DepotMAC
+from src.mac_protocol.buffered_random import BufferedRandom
+from src.mac_protocol.bandit import BanditState
 import numpy as np
 
 """
@@ -12,41 +14,58 @@ class AI_MAC(DepotMAC):
 
     def __init__(self, simulator, depot):
         super().__init__(simulator, depot)
-        self.rnd_mac = np.random.RandomState(self.simulator.seed)
-
-        # list used to count the number of packets generated from each drone
-        self.packets = [0] * self.simulator.n_drones
-        # list used to represent the probability that a drone can generate a packet
-        self.probs = [0] * self.simulator.n_drones
-        self.N = [1] * self.simulator.n_drones  # list used to count the number of time that a drone is queried
-        self.Q = [0] * self.simulator.n_drones  # list used to define the estimated reward value
+        self.rnd_mac = BufferedRandom(self.simulator.seed)
+
+        # vector used to count the number of packets generated from each drone, and their running total
+        self.packets = np.zeros(self.simulator.n_drones, dtype=np.int64)
+        self.packets_total: int = 0
+        # vector used to represent the probability that a drone can generate a packet, fixed at the end of learning
+        self.probs = np.zeros(self.simulator.n_drones, dtype=np.float64)
+        self.bandit = BanditState(self.simulator.n_drones)  # estimated reward value and number of queries for each drone
+        self.base_q: np.ndarray = None  # Q learned from probs, the value each arm goes back to at every step
+        self.last_updated_drone: int = None  # the only arm of Q that differs from base_q
         self.epsilon = 0.05  # epsilon best value
 
     def allocate_resource_to_drone(self, drones: list, cur_step: int) -> Drone:
         """ Return the drone to who allocate bandwith for upload data in this step """
 
+        learning_phase: bool = cur_step < 0.17 * self.simulator.len_simulation
+
         if self.last_feedback != None:
             (drone, transmission, feedback) = self.last_feedback
-            self.packets[drone.identifier] += feedback
+            if learning_phase:
+                # probs only depends on the packets counted during learning
+                self.packets[drone.identifier] += feedback
+                self.packets_total += feedback
 
         # the following is the learning phase
-        if cur_step < 0.17 * self.simulator.len_simulation:
+        if learning_phase:
             drone_to_return = self.rnd_mac.choice(drones)
-            self.probs = [(self.packets[d.identifier] / (sum(self.packets) + 1)) for d in drones]
             return drone_to_return
 
         else:  # after the learning steps
-            self.Q = [(self.probs[d.identifier] * 100) + 1 for d in drones]
+            if self.base_q is None:
+                # first step after learning, we compute probs and Q only once
+                self.probs = self.packets / (self.packets_total + 1)
+                self.base_q = self.probs * 100 + 1
+                self.bandit.set_all(self.base_q)
+            elif self.last_updated_drone is not None:
+                # Q is reset to base_q at every step, only the last updated arm has to be restored
+                self.bandit.set_q(self.last_updated_drone, self.base_q[self.last_updated_drone])
+
+            q_value = self.bandit.Q[drone.identifier]
 
             # how we update the estimated reward values
             if transmission and feedback > 0:
-                self.Q[drone.identifier] += 1 + feedback
+                q_value += 1 + feedback
             elif transmission and feedback == 0:
-                self.Q[drone.identifier] += 0
+                q_value += 0
             elif transmission == False and feedback > 0:
-                self.Q[drone.identifier] += feedback
+                q_value += feedback
             elif transmission == False and feedback == 0:
-                self.Q[drone.identifier] /= 2
+                q_value /= 2
+            self.bandit.set_q(drone.identifier, q_value)
+            self.last_updated_drone = drone.identifier
 
         rv = self.rnd_mac.rand()
 
@@ -55,16 +74,14 @@ class AI_MAC(DepotMAC):
 
         else:  # greedy step chosen with probability 1 - epsilon
 
-            max_value = max(self.Q)
-            indices = [index for index, value in enumerate(self.Q) if value == max_value]
             """
-            indices is the index list of the best drones w.r.t. max Q value
+            best_arm takes the index list of the best drones w.r.t. max Q value
             to avoid to choose always the same drone from indices we pick one uniform at random  
             """
-            drone_id = self.rnd_mac.choice(indices)
+            drone_id = self.bandit.best_arm(self.rnd_mac)
             drone_to_return = drones[drone_id]
 
-        self.N[drone_to_return.identifier] += 1
+        self.bandit.N[drone_to_return.identifier] += 1
 
         return drone_to_return
 
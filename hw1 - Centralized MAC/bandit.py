@@ -0,0 +1,151 @@
+import numpy as np
+
+"""
+Array-backed state shared by the depot MAC policies.
+Q and N are stored as numpy vectors indexed by drone identifier, the best arm is kept by a max segment tree
+so that a step only costs O(log n_drones) when a single Q value changes.
+"""
+
+
+class MaxTree:
+    """
+    Segment tree over a vector of values: each node keeps the max of its leaves and how many leaves reach it.
+    The counters let us pick one of the tied best leaves uniform at random walking down a single path.
+    """
+
+    def __init__(self, values: np.ndarray):
+        self.n = len(values)
+        self.size = 1
+        while self.size < self.n:
+            self.size *= 2
+        self.max = np.full(2 * self.size, -np.inf, dtype=np.float64)  # max value in the subtree
+        self.count = np.zeros(2 * self.size, dtype=np.int64)  # number of leaves equal to the max in the subtree
+        self.build(values)
+
+    def build(self, values: np.ndarray) -> None:
+        """ Rebuild the whole tree from the given values, level by level """
+        self.max[self.size:self.size + self.n] = values
+        self.count[self.size:self.size + self.n] = 1
+        lo = self.size // 2
+        while lo >= 1:
+            left_max, right_max = self.max[2 * lo:4 * lo:2], self.max[2 * lo + 1:4 * lo:2]
+            left_count, right_count = self.count[2 * lo:4 * lo:2], self.count[2 * lo + 1:4 * lo:2]
+            level_max = np.maximum(left_max, right_max)
+            self.max[lo:2 * lo] = level_max
+            self.count[lo:2 * lo] = np.where(left_max == level_max, left_count, 0) + \
+                                    np.where(right_max == level_max, right_count, 0)
+            lo //= 2
+
+    def update(self, index: int, value: float) -> None:
+        """ Set the value of a leaf and fix the path up to the root """
+        i = self.size + index
+        self.max[i] = value
+        i //= 2
+        while i >= 1:
+            left, right = 2 * i, 2 * i + 1
+            left_max, right_max = self.max[left], self.max[right]
+            if left_max > right_max:
+                self.max[i], self.count[i] = left_max, self.count[left]
+            elif right_max > left_max:
+                self.max[i], self.count[i] = right_max, self.count[right]
+            else:
+                self.max[i], self.count[i] = left_max, self.count[left] + self.count[right]
+            i //= 2
+
+    def sample_best(self, rnd) -> int:
+        """ Return one of the leaves with the max value, uniform at random """
+        k = rnd.randint(0, self.count[1])  # the k-th best leaf from left to right
+        i = 1
+        while i < self.size:
+            left = 2 * i
+            if self.max[left] == self.max[i]:
+                if k < self.count[left]:
+                    i = left
+                    continue
+                k -= self.count[left]
+            i = left + 1
+        return i - self.size
+
+
+class BanditState:
+
+    def __init__(self, n_arms: int, initial_q: float = 0, initial_n: int = 1):
+        self.Q = np.full(n_arms, initial_q, dtype=np.float64)  # estimated reward value for each drone
+        self.N = np.full(n_arms, initial_n, dtype=np.int64)  # number of time that a drone is queried
+        self.best = MaxTree(self.Q)  # index over Q, always write Q through set_q/set_all to keep it valid
+
+    def set_q(self, arm: int, value: float) -> None:
+        self.Q[arm] = value
+        self.best.update(arm, self.Q[arm])
+
+    def set_all(self, values) -> None:
+        self.Q[:] = values
+        self.best.build(self.Q)
+
+    def incremental_update(self, arm: int, reward: float) -> None:
+        # incremental update rule of the estimated reward value
+        self.set_q(arm, self.Q[arm] + (1 / self.N[arm]) * (reward - self.Q[arm]))
+
+    def best_arm(self, rnd) -> int:
+        """
+        Return the index of a best arm w.r.t. Q, ties are broken uniform at random.
+        It draws the same number as rnd.choice over the sorted tied indices, so the decisions do not change.
+        """
+        return self.best.sample_best(rnd)
+
+
+class UCBIndex:
+    """
+    UCB1 index of each arm: mean reward + c * sqrt(log n / n_arm), with n the total number of rewards.
+    Mean and count are kept apart, so the exploration bonus is never folded into the estimated reward.
+    With gamma < 1 rewards and counts are discounted at every update (discounted UCB), so the index follows
+    rewards that change over time, like the backlog of the drones.
+    The total count after k updates only depends on k, so its log is precomputed once for the whole simulation.
+    """
+
+    def __init__(self, n_arms: int, len_simulation: int, c: float = 1, gamma: float = 1):
+        self.c = c  # parameter that controls the amount of exploration
+        self.gamma = gamma  # discount of the past rewards, 1 means no discount
+        self.updates: int = 0  # number of rewards received
+
+        # the discount is applied lazily: the real sums and counts are the stored ones times scale
+        self.scale: float = 1
+        self.sums = np.zeros(n_arms, dtype=np.float64)  # sum of the rewards of each drone
+        self.counts = np.zeros(n_arms, dtype=np.float64)  # number of rewards of each drone
+        self.means = np.zeros(n_arms, dtype=np.float64)  # mean reward of each drone
+        self.inv_sqrt_counts = np.full(n_arms, np.inf)  # 1 / sqrt(counts), inf for the drones never rewarded
+        self.index = np.empty(n_arms, dtype=np.float64)  # buffer reused at every step
+
+        updates = np.arange(len_simulation + 1, dtype=np.float64)
+        totals = updates if gamma == 1 else (1 - gamma ** updates) / (1 - gamma)
+        self.log_table = np.log(np.maximum(totals, 1))  # log of the total count after k updates
+
+    def update(self, arm: int, reward: float) -> None:
+        """ Add a reward to an arm, only the values of that arm change """
+        self.scale *= self.gamma
+        if self.scale < 1e-100:
+            # move the scale into the vectors before it underflows
+            self.sums *= self.scale
+            self.counts *= self.scale
+            self.inv_sqrt_counts /= np.sqrt(self.scale)
+            self.scale = 1
+        self.sums[arm] += reward / self.scale
+        self.counts[arm] += 1 / self.scale
+        self.means[arm] = self.sums[arm] / self.counts[arm]
+        self.inv_sqrt_counts[arm] = 1 / np.sqrt(self.counts[arm])
+        self.updates += 1
+
+    def compute(self) -> np.ndarray:
+        """ Return the index of all the arms, arms never rewarded have an infinite index """
+        log_n = self.log_table[min(self.updates, len(self.log_table) - 1)]
+        # the bonus of every arm is the same factor times 1 / sqrt(stored count), the factor is never 0 so
+        # the drones never rewarded keep an infinite index
+        factor = max(self.c * np.sqrt(log_n / self.scale), np.finfo(np.float64).tiny)
+        np.multiply(self.inv_sqrt_counts, factor, out=self.index)
+        np.add(self.index, self.means, out=self.index)
+        return self.index
+
+    def best_arm(self, rnd) -> int:
+        """ Return the arm with the highest index, ties are broken uniform at random """
+        index = self.compute()
+        return int(rnd.choice(np.flatnonzero(index == index.max())))
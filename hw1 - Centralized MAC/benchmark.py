@@ -0,0 +1,144 @@
+import argparse
+import importlib
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+import types
+
+import numpy as np
+
+"""
+Benchmark of the depot MAC policies without the simulator.
+Each policy is replayed against synthetic traffic through the stand-in simulator of trace.py and we report
+steps per second, peak memory and ratio of delivered packets for a range of fleet sizes.
+Run it from this folder, e.g.:
+    python benchmark.py --drones 5 50 500 10000 --output results.json
+    python benchmark.py --compare old_results.json new_results.json
+"""
+
+POLICIES = {'AI_MAC': 'ai', 'AIncremental': 'incr', 'AIucb': 'ucb', 'AIthompson': 'ts', 'OverlapMAC': 'ol',
+            'OnlineOverlapMAC': 'ol'}
+
+
+def _install_stand_in_simulator() -> None:
+    """
+    Register the few simulator modules imported by the policies, if the simulator is not available.
+    src.mac_protocol points to this folder, so the policies import each other as they do in the simulator.
+    """
+    try:
+        importlib.import_module('src.mac_protocol.depot_mac')
+        return
+    except ImportError:
+        pass
+
+    class DepotMAC:
+
+        def __init__(self, simulator, depot):
+            self.simulator = simulator
+            self.depot = depot
+            self.last_feedback = None
+
+    class Drone:
+        pass
+
+    modules = {'src': None, 'src.mac_protocol': [os.path.dirname(os.path.abspath(__file__))],
+               'src.entities': None, 'src.mac_protocol.depot_mac': DepotMAC, 'src.entities.uav_entities': Drone}
+    for name, content in modules.items():
+        module = types.ModuleType(name)
+        if isinstance(content, list) or content is None:
+            module.__path__ = content or []
+        else:
+            setattr(module, content.__name__, content)
+        sys.modules[name] = module
+
+
+def synthetic_arrivals(n_drones: int, len_simulation: int, load: float, seed: int) -> list:
+    """
+    Return for each drone the sorted list of steps in which it generates a packet.
+    In each step a packet is generated with probability load, by a drone chosen with skewed weights,
+    so few drones generate most of the traffic as in the patrolling scenarios.
+    """
+    rnd = np.random.RandomState(seed)
+    weights = rnd.dirichlet(np.full(n_drones, 0.5))
+    steps = np.flatnonzero(rnd.random_sample(len_simulation) < load)
+    owners = rnd.choice(n_drones, size=len(steps), p=weights)
+    order = np.argsort(owners, kind='stable')  # steps stay sorted within each drone
+    bounds = np.searchsorted(owners[order], np.arange(n_drones + 1))
+    sorted_steps = steps[order]
+    return [sorted_steps[bounds[i]:bounds[i + 1]].tolist() for i in range(n_drones)]
+
+
+def _len_simulation(policy: str, n_drones: int, steps: int) -> int:
+    """ OverlapMAC needs at least two learning steps for each drone, and a learning phase multiple of n_drones """
+    if policy not in ('OverlapMAC', 'OnlineOverlapMAC'):
+        return steps
+    learning_block = 10 * n_drones
+    return learning_block * max(2, math.ceil(steps / learning_block))
+
+
+def run_benchmark(drones: list, steps: int, load: float, seed: int, policies: list) -> list:
+    trace = importlib.import_module('src.mac_protocol.trace')
+    results = []
+    for n_drones in drones:
+        for policy in policies:
+            policy_cls = getattr(importlib.import_module('src.mac_protocol.' + POLICIES[policy]), policy)
+            len_simulation = _len_simulation(policy, n_drones, steps)
+            arrivals = synthetic_arrivals(n_drones, len_simulation, load, seed)
+
+            # the timed run and the memory run are separated, tracemalloc slows down the interpreter
+            result = trace.replay_arrivals(policy_cls, arrivals, len_simulation, seed)
+            tracemalloc.start()
+            trace.replay_arrivals(policy_cls, arrivals, len_simulation, seed)
+            result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            result['load'] = load
+            results.append(result)
+            print("%-16s n_drones=%-6d steps/s=%-10.0f peak=%-8.1fKiB delivered=%.3f" % (
+                policy, n_drones, result['steps_per_second'], result['peak_memory_bytes'] / 1024,
+                result['delivery_ratio']))
+    return results
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """ Print the relative change of each metric between two result files """
+    with open(old_path) as f:
+        old = {(r['policy'], r['n_drones']): r for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = {(r['policy'], r['n_drones']): r for r in json.load(f)['results']}
+    for key in sorted(old.keys() & new.keys()):
+        speed = new[key]['steps_per_second'] / old[key]['steps_per_second']
+        memory = new[key]['peak_memory_bytes'] / max(old[key]['peak_memory_bytes'], 1)
+        delivered = new[key]['delivery_ratio'] - old[key]['delivery_ratio']
+        print("%-16s n_drones=%-6d speed x%.2f memory x%.2f delivered %+.3f" % (key + (speed, memory, delivered)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the depot MAC policies")
+    parser.add_argument('--drones', type=int, nargs='+', default=[5, 50, 500, 5000, 10000])
+    parser.add_argument('--steps', type=int, default=20000, help="simulation length")
+    parser.add_argument('--load', type=float, default=0.8, help="probability that a packet is generated in a step")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--policies', nargs='+', default=list(POLICIES), choices=list(POLICIES))
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    _install_stand_in_simulator()
+    results = run_benchmark(args.drones, args.steps, args.load, args.seed, args.policies)
+    with open(args.output, 'w') as f:
+        json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                   'config': {'drones': args.drones, 'steps': args.steps, 'load': args.load, 'seed': args.seed},
+                   'results': results}, f, indent=2)
+    print("results saved in", args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 from src.entities.uav_entities import Drone
 from src.mac_protocol.depot_mac import DepotMAC
-import numpy as np
+from src.mac_protocol.buffered_random import BufferedRandom
+from src.mac_protocol.bandit import BanditState
 
 """
 The class is responsable to allocate communication resources to neighbors drones that want to offload data to the depot.
@@ -12,9 +13,8 @@ class AIncremental(DepotMAC):
 
     def __init__(self, simulator, depot):
         super().__init__(simulator, depot)
-        self.rnd_mac = np.random.RandomState(self.simulator.seed)
-        self.N = [1] * simulator.n_drones
-        self.Q = [9] * simulator.n_drones  # optimistic initial value --- (best ones)
+        self.rnd_mac = BufferedRandom(self.simulator.seed)
+        self.bandit = BanditState(simulator.n_drones, initial_q=9)  # optimistic initial value --- (best ones)
         self.epsilon = 0.2  # epsilon variable
 
     def allocate_resource_to_drone(self, drones: list, cur_step: int) -> Drone:
@@ -37,8 +37,7 @@ class AIncremental(DepotMAC):
             reward = 0
 
         # we apply the incremental update rule
-        self.Q[drone.identifier] = self.Q[drone.identifier] + (1 / self.N[drone.identifier]) * (
-                    reward - self.Q[drone.identifier])
+        self.bandit.incremental_update(drone.identifier, reward)
         rv = self.rnd_mac.rand()
 
         if rv <= self.epsilon:  # random step with probability epsilon
@@ -46,12 +45,9 @@ class AIncremental(DepotMAC):
 
         else:  # greedy step with probability 1 - epsilon
 
-            max_value = max(self.Q)  # search the best value in the Qtable
-            indices = [index for index, value in enumerate(self.Q) if value == max_value]
-            # take all the indices that have that best value (max_value)
-            drone_id = self.rnd_mac.choice(indices)  # choose a random index from the "best" ones
+            drone_id = self.bandit.best_arm(self.rnd_mac)  # choose a random index from the "best" ones
             drone_to_return = drones[drone_id]  # define the drone to return using the index id
 
-        self.N[drone_to_return.identifier] += 1  # increment the counter that tell how many time we pick that drone
+        self.bandit.N[drone_to_return.identifier] += 1  # increment the counter that tell how many time we pick that drone
 
         return drone_to_return
\ No newline at end of file
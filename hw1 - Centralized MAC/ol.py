@@ -2,6 +2,7 @@ import itertools
 
 from src.entities.uav_entities import Drone
 from src.mac_protocol.depot_mac import DepotMAC
+from src.mac_protocol.buffered_random import BufferedRandom
 import numpy as np
 
 """
@@ -12,12 +13,17 @@ We work over an semplified TDMA approach, each time step only one drone can rece
 
 class OverlapMAC(DepotMAC):
 
-    def __init__(self, simulator, depot):
+    def __init__(self, simulator, depot, online_schedule: bool = False, refresh_period: int = None,
+                 schedule_budget: int = 32):
+        """
+        With online_schedule the schedule is built a few entries per step during the steps after learning, and it is
+        refreshed every refresh_period steps (5 schedules by default) from the post-learning feedback, otherwise it is
+        built once at the end of learning. The simulator passes only simulator and depot, so the online mode is
+        selected with OnlineOverlapMAC or e.g. functools.partial(OverlapMAC, online_schedule=True).
+        """
         super().__init__(simulator, depot)
-        self.rnd_mac = np.random.RandomState(self.simulator.seed)
+        self.rnd_mac = BufferedRandom(self.simulator.seed)
 
-        self.list_drone_feedback = {}  # dictionary that save the feedback received for each drone
-        self.counter_frequency = {}  # dictionary that count the number of True transmission for each drone
         self.schedule = []  # learned pattern
         self.always_best: list = None  # set of best drones
         self.schedule_counter = 0
@@ -33,28 +39,90 @@ class OverlapMAC(DepotMAC):
 
         self.module = self.drone_step - 1
 
+        # matrix drone x learning step, True if the drone transmitted in that step of its learning window
+        self.feedback_matrix = np.zeros((self.number_of_drones, max(self.drone_step, 0)), dtype=bool)
+        self.feedback_length = np.zeros(self.number_of_drones, dtype=np.int64)  # feedback received for each drone
+        self.counter_frequency = np.zeros(self.number_of_drones, dtype=np.int64)  # number of True transmission for each drone
+
+        # online variables, the schedule is built a few entries per step and refreshed from post-learning feedback
+        self.online_schedule: bool = online_schedule  # if False the schedule is built once at the end of learning
+        self.schedule_budget: int = schedule_budget  # max number of schedule entries built in a single step
+        # steps between two refresh of the schedule
+        self.refresh_period: int = refresh_period if refresh_period is not None else 5 * self.module
+        self.rate_decay: float = 0.1  # weight of the last feedback in the transmission rate of a slot
+        self.slot_rate: np.ndarray = None  # drone x slot, moving average of the post-learning transmissions
+        self.schedule_builder = None  # generator of the schedule under construction
+        self.next_schedule: list = None  # schedule under construction, it replaces schedule when complete
+        self.last_refresh: int = 0
+        self.last_slot: int = None  # slot of the schedule used in the previous step
+
     def _count_frequency(self):
-        # function that count for each drone the true transmission from
-        # list_drone_feedback and save it in counter_frequency dictionary
-        for drone_sequence in self.list_drone_feedback.keys():
-            count = 0
-            for step in self.list_drone_feedback[drone_sequence]:
-                if step != -1:
-                    count += 1
-            self.counter_frequency[drone_sequence] = count
+        # function that count for each drone the true transmission in the feedback matrix
+        self.counter_frequency = self.feedback_matrix.sum(axis=1)
 
     def _take_best(self) -> list:
         # function that take the best drones w.r.t. higher frequency
-        best: list = []
-        s = sum(self.counter_frequency.values())
-        counter_frequency_per = [((cf / s) * 100) for cf in self.counter_frequency.values()]
-        _max = max(counter_frequency_per)
-        drone_best_id = counter_frequency_per.index(_max)
-        for i, cfp in enumerate(counter_frequency_per):
-            if abs(cfp - counter_frequency_per[drone_best_id]) <= 0.35 * _max:
-                best.append(i)
-
-        return best
+        s = self.counter_frequency.sum()
+        counter_frequency_per = (self.counter_frequency / s) * 100
+        _max = counter_frequency_per.max()
+        best = np.flatnonzero(np.abs(counter_frequency_per - _max) <= 0.35 * _max)
+
+        return best.tolist()
+
+    def _schedule_entries(self, observed: np.ndarray, always_best: list):
+        # we produce a schedule based on the learned drones behavior, yielding one entry at a time
+        overlap_size = observed.sum(axis=0)  # number of transmitting drones for each step of the pattern
+        steps, drones = np.nonzero(observed.T)  # transmitting drones sorted by step
+        overlap_end = np.cumsum(overlap_size).tolist()
+        overlap_size, drones = overlap_size.tolist(), drones.tolist()  # the loop below only reads python scalars
+
+        # seq[randint(0, len(seq))] is the same draw of rnd_mac.choice(seq) without its per call overhead
+        randint = self.rnd_mac.randint
+        for i in range(len(overlap_size)):
+            if overlap_size[i] >= 2:  # a virtual overlap of transmission
+                overlap = drones[overlap_end[i] - overlap_size[i]:overlap_end[i]]
+                candidates = list(set(overlap) | set(always_best))
+                yield candidates[randint(0, len(candidates))]
+            elif overlap_size[i] == 1:  # only one transmission
+                rv = self.rnd_mac.random()
+                if rv <= self.epsilon:  # random step with epsilon probability
+                    yield always_best[randint(0, len(always_best))]
+                else:  # normal step with 1 - epsilon probability
+                    yield drones[overlap_end[i] - 1]
+            else:  # no transmission then we take one best drone uniform at random
+                yield always_best[randint(0, len(always_best))]
+
+    def _build_schedule(self):
+        self.schedule.extend(self._schedule_entries(self.feedback_matrix[:, :self.module], self.always_best))
+
+    def _online_step(self, cur_step: int):
+        # the feedback refers to the slot of the schedule used in the previous step
+        if self.last_slot is not None and self.last_feedback != None:
+            (drone, transmission, feedback) = self.last_feedback
+            rate = self.slot_rate[drone.identifier, self.last_slot]
+            self.slot_rate[drone.identifier, self.last_slot] = rate + self.rate_decay * (transmission - rate)
+
+        if self.schedule_builder is None and cur_step - self.last_refresh >= self.refresh_period:
+            self.last_refresh = cur_step
+            self.counter_frequency = self.slot_rate.sum(axis=1)
+            if self.counter_frequency.sum() > 0:
+                # the new schedule is built in background, the current one is used until it is complete
+                self.always_best: list = self._take_best()
+                self.next_schedule = []
+                self.schedule_builder = self._schedule_entries(self.slot_rate >= 0.5, self.always_best)
+
+        if self.schedule_builder is not None:
+            needed = (self.schedule_counter + 1) % self.module  # entry of the schedule used in this step
+            budget = self.schedule_budget
+            # the first schedule is built on demand, so the entry used in this step is always ready
+            while budget > 0 or (self.next_schedule is self.schedule and len(self.schedule) <= needed):
+                entry = next(self.schedule_builder, None)
+                if entry is None:  # schedule complete
+                    self.schedule = self.next_schedule
+                    self.schedule_builder = None
+                    break
+                self.next_schedule.append(entry)
+                budget -= 1
 
     def allocate_resource_to_drone(self, drones: list, cur_step: int) -> Drone:
         """ Return the drone to who allocate bandwith for upload data in this step """
@@ -64,38 +132,44 @@ class OverlapMAC(DepotMAC):
 
         # initialization step
         if cur_step < 1:
-            for drone in drones:
-                self.list_drone_feedback[drone.identifier] = []
             return drones[0]
 
         # learning phase
         if cur_step < self.learning_duration:
             actual_drone = int(cur_step // self.drone_step)
-            self.list_drone_feedback[drones[actual_drone].identifier].append(actual_drone if transmission else -1)
+            drone_id = drones[actual_drone].identifier
+            self.feedback_matrix[drone_id, self.feedback_length[drone_id]] = transmission
+            self.feedback_length[drone_id] += 1
+            if self.online_schedule:
+                self.counter_frequency[drone_id] += bool(transmission)
             return drones[actual_drone]
 
         else:
             # end of the learning phase, we use this "if" only one time after learning
             if cur_step == self.learning_duration:
-                self._count_frequency()
-                self.always_best: list = self._take_best()
-
-                # we produce a schedule based on the learned drones behavior
-                for i in range(self.module):
-                    overlap = []
-                    for drone_sequence in self.list_drone_feedback.keys():
-                        if self.list_drone_feedback[drone_sequence][i] != -1:
-                            overlap.append(drone_sequence)
-                    if len(overlap) >= 2:  # a virtual overlap of transmission
-                        self.schedule.append(self.rnd_mac.choice(list(set(overlap) | set(self.always_best))))
-                    elif len(overlap) == 1:  # only one transmission
-                        rv = self.rnd_mac.random()
-                        if rv <= self.epsilon:  # random step with epsilon probability
-                            self.schedule.append(self.rnd_mac.choice(self.always_best))
-                        else:  # normal step with 1 - epsilon probability
-                            self.schedule.append(overlap[0])
-                    else:  # no transmission then we take one best drone uniform at random
-                        self.schedule.append(self.rnd_mac.choice(self.always_best))
+                if self.online_schedule:
+                    # the frequencies are counted during learning, the schedule is built in the next steps
+                    self.always_best: list = self._take_best()
+                    self.slot_rate = self.feedback_matrix[:, :self.module].astype(np.float64)
+                    self.next_schedule = self.schedule
+                    self.schedule_builder = self._schedule_entries(self.feedback_matrix[:, :self.module],
+                                                                   self.always_best)
+                    self.last_refresh = cur_step
+                else:
+                    self._count_frequency()
+                    self.always_best: list = self._take_best()
+                    self._build_schedule()
+
+            if self.online_schedule:
+                self._online_step(cur_step)
 
             self.schedule_counter += 1
-            return self.simulator.drones[self.schedule[self.schedule_counter % self.module]]
\ No newline at end of file
+            self.last_slot = self.schedule_counter % self.module
+            return self.simulator.drones[self.schedule[self.last_slot]]
+
+
+class OnlineOverlapMAC(OverlapMAC):
+    """ OverlapMAC with the schedule built and refreshed online """
+
+    def __init__(self, simulator, depot):
+        super().__init__(simulator, depot, online_schedule=True)
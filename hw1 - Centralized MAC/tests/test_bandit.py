@@ -0,0 +1,69 @@
+import numpy as np
+
+from src.mac_protocol.bandit import BanditState, MaxTree, UCBIndex
+
+
+def _tied_choice(values: np.ndarray, rnd) -> int:
+    # the tie break of the policies before the tree: rnd.choice over the sorted indices of the best values
+    return int(rnd.choice(np.flatnonzero(values == values.max())))
+
+
+def test_sample_best_draws_as_choice_over_ties():
+    values_rnd = np.random.RandomState(7)
+    for n in (1, 2, 3, 5, 8, 13, 64, 100):
+        values = values_rnd.randint(0, 3, size=n).astype(np.float64)
+        tree = MaxTree(values)
+        tree_rnd, choice_rnd = np.random.RandomState(n), np.random.RandomState(n)
+        for _ in range(50):
+            assert tree.sample_best(tree_rnd) == _tied_choice(values, choice_rnd)
+
+
+def test_update_keeps_ties():
+    rnd = np.random.RandomState(3)
+    values = np.zeros(37)
+    tree = MaxTree(values)
+    for _ in range(500):
+        index, value = rnd.randint(0, len(values)), float(rnd.randint(0, 4))
+        values[index] = value
+        tree.update(index, value)
+        assert tree.max[1] == values.max()
+        assert tree.count[1] == np.count_nonzero(values == values.max())
+        assert values[tree.sample_best(rnd)] == values.max()
+
+
+def test_best_arm_follows_q():
+    state = BanditState(10)
+    tree_rnd, choice_rnd = np.random.RandomState(0), np.random.RandomState(0)
+    for arm, reward in ((2, 1), (5, 1), (2, 0), (9, 1), (5, 0.5)):
+        state.incremental_update(arm, reward)
+        state.N[arm] += 1
+        assert state.best_arm(tree_rnd) == _tied_choice(state.Q, choice_rnd)
+    state.set_all(np.ones(10))
+    assert state.best_arm(tree_rnd) == _tied_choice(state.Q, choice_rnd)
+
+
+def _direct_ucb_index(rewards: list, n_arms: int, c: float, gamma: float) -> np.ndarray:
+    # discounted sums and counts recomputed from the whole history
+    sums, counts = np.zeros(n_arms), np.zeros(n_arms)
+    for age, (arm, reward) in enumerate(reversed(rewards)):
+        sums[arm] += gamma ** age * reward
+        counts[arm] += gamma ** age
+    index = np.full(n_arms, np.inf)
+    rewarded = counts > 0
+    index[rewarded] = sums[rewarded] / counts[rewarded] + \
+                      c * np.sqrt(np.log(max(counts.sum(), 1)) / counts[rewarded])
+    return index
+
+
+def test_ucb_index_matches_the_direct_computation():
+    for gamma in (1, 0.9, 0.5):  # 0.5 moves the scale into the vectors every ~330 updates
+        rnd = np.random.RandomState(1)
+        ucb = UCBIndex(4, 1000, c=1.5, gamma=gamma)
+        rewards = []
+        for k in range(1000):
+            arm = rnd.randint(0, 3)  # the last arm is never rewarded
+            rewards.append((arm, float(rnd.randint(0, 5))))
+            ucb.update(*rewards[-1])
+            if k % 97 == 0 or k == 999:
+                index, direct = ucb.compute(), _direct_ucb_index(rewards, 4, 1.5, gamma)
+                assert np.allclose(index, direct, rtol=1e-9)
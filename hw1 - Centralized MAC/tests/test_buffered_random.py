@@ -0,0 +1,29 @@
+import numpy as np
+
+from src.mac_protocol.buffered_random import BufferedRandom
+
+
+def test_same_numbers_as_random_state():
+    # a small block so that the draws cross the block boundaries
+    buffered, reference = BufferedRandom(11, block_size=7), np.random.RandomState(11)
+    calls = np.random.RandomState(0)
+    for _ in range(3000):
+        call = calls.randint(0, 4)
+        if call == 0:
+            assert buffered.random() == reference.random_sample()
+        elif call == 1:
+            low, high = sorted(calls.randint(0, 3000, size=2).tolist())
+            high += 1
+            assert buffered.randint(low, high) == reference.randint(low, high)
+        elif call == 2:
+            seq = list(range(calls.randint(1, 40)))
+            assert buffered.choice(seq) == reference.choice(seq)
+        else:
+            size = calls.randint(1, 20)
+            assert np.array_equal(buffered.random_block(size), reference.random_sample(size))
+
+
+def test_randint_without_draws():
+    buffered, reference = BufferedRandom(3), np.random.RandomState(3)
+    assert buffered.randint(4, 5) == reference.randint(4, 5) == 4
+    assert buffered.random() == reference.random_sample()
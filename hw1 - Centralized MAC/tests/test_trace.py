@@ -0,0 +1,48 @@
+import numpy as np
+
+from src.mac_protocol import trace
+from src.mac_protocol.ucb import AIucb
+
+
+class BufferedDrone(trace.StubDrone):
+
+    def __init__(self, identifier: int):
+        super().__init__(identifier)
+        self.packets = 0
+
+    def buffer_length(self) -> int:
+        return self.packets
+
+
+def _run_recorded(path: str, n_drones: int, len_simulation: int, seed: int) -> int:
+    """ Closed loop of the recorded policy on random traffic, return the delivered packets """
+    simulator = trace.StubSimulator(seed, n_drones, len_simulation)
+    simulator.drones = [BufferedDrone(i) for i in range(n_drones)]
+    policy = trace.recorded(AIucb, path)(simulator, trace.StubDepot())
+    rnd = np.random.RandomState(seed)
+    delivered = 0
+    for cur_step in range(len_simulation):
+        for drone in simulator.drones:
+            drone.packets += rnd.random_sample() < 0.05
+        drone = policy.allocate_resource_to_drone(simulator.drones, cur_step)
+        transmission = drone.packets > 0
+        drone.packets -= transmission
+        delivered += transmission
+        policy.last_feedback = (drone, transmission, drone.packets)
+    return delivered
+
+
+def test_replay_agrees_with_the_recorded_run(tmp_path):
+    path = str(tmp_path / 'ucb')
+    delivered = _run_recorded(path, n_drones=12, len_simulation=2000, seed=5)
+
+    meta, feedback, generated = trace.load_trace(path)
+    assert meta['n_drones'] == 12 and len(feedback) == 2000
+    assert (feedback['drone'][1:] >= 0).all()
+
+    result = trace.replay_feedback(AIucb, path, chunk=300)
+    assert result['compared'] == 1999
+    assert result['agreement'] == 1.0
+
+    # the closed loop replay takes the same decisions on the recorded traffic
+    assert trace.replay_trace(AIucb, path)['delivered'] == delivered
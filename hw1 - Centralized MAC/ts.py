@@ -0,0 +1,78 @@
+from src.entities.uav_entities import Drone
+from src.mac_protocol.depot_mac import DepotMAC
+from src.mac_protocol.buffered_random import BufferedRandom
+import numpy as np
+
+"""
+The class is responsable to allocate communication resources to neighbors drones that want to offload data to the depot.
+We work over an semplified TDMA approach, each time step only one drone can receive the resource and communicate a packet to the depot.
+"""
+
+
+class AIthompson(DepotMAC):
+
+    def __init__(self, simulator, depot):
+        super().__init__(simulator, depot)
+        self.rnd_mac = BufferedRandom(self.simulator.seed)
+        self.rnd_posterior = np.random.RandomState([self.simulator.seed, 1])  # Beta samples, not the stream of rnd_mac
+
+        # Beta(1 + successes, 1 + failures) posterior of the probability that a drone has a packet to send
+        # the discount is applied lazily as in bandit.UCBIndex: the real counts are the stored ones times scale
+        self.successes = np.zeros(simulator.n_drones, dtype=np.float64)
+        self.failures = np.zeros(simulator.n_drones, dtype=np.float64)
+        self.scale: float = 1
+        self.gamma = 1 - 1 / max(2, simulator.n_drones)  # discount of the past feedback, about one round of the fleet
+
+        # last posterior sample of each drone, each step resamples the drone fed back and a block of the others
+        self.samples = self.rnd_posterior.random_sample(simulator.n_drones)
+        resample_block: int = min(16, simulator.n_drones)
+        # drones resampled in each step of a round, the last position is for the drone fed back in the step
+        self.resample_blocks = [np.append(np.arange(start, start + resample_block) % simulator.n_drones, 0)
+                                for start in range(0, simulator.n_drones, resample_block)]
+        self.next_block: int = 0
+
+    def _add_feedback(self, drone_id: int, success: float, failure: float) -> None:
+        self.scale *= self.gamma
+        if self.scale < 1e-100:
+            # move the scale into the vectors before it underflows
+            self.successes *= self.scale
+            self.failures *= self.scale
+            self.scale = 1
+        self.successes[drone_id] += success / self.scale
+        self.failures[drone_id] += failure / self.scale
+
+    def _resample(self, drone_ids: np.ndarray) -> None:
+        """
+        New samples from the posterior of the given drones. Beta(a, b) is X / (X + Y) with X ~ Gamma(a) and
+        Y ~ Gamma(b), so all the gamma samples are drawn in a single call.
+        """
+        shapes = np.concatenate((self.successes[drone_ids], self.failures[drone_ids]))
+        shapes *= self.scale
+        shapes += 1
+        x = self.rnd_posterior.standard_gamma(shapes)
+        self.samples[drone_ids] = x[:len(drone_ids)] / (x[:len(drone_ids)] + x[len(drone_ids):])
+
+    def allocate_resource_to_drone(self, drones: list, cur_step: int) -> Drone:
+        """ Return the drone to who allocate bandwith for upload data in this step """
+
+        if self.last_feedback != None:
+            (drone, transmission, feedback) = self.last_feedback
+
+        if cur_step == 0:
+            return self.rnd_mac.choice(drones)  # at the first step we choose a random drone
+
+        # the transmission tells if the drone had a packet, the feedback (packets left in its buffer) if it still has one
+        success = bool(transmission) + (feedback > 0)
+        self._add_feedback(drone.identifier, success, 2 - success)
+
+        # the posterior of the drone fed back changed, the others only lose weight with the discount
+        # so their samples are refreshed a block at a time, each drone every n_drones / resample_block steps
+        block = self.resample_blocks[self.next_block]
+        self.next_block = (self.next_block + 1) % len(self.resample_blocks)
+        block[-1] = drone.identifier
+        self._resample(block)
+
+        drone_id = int(self.samples.argmax())  # the drone with the best sample
+        drone_to_return = drones[drone_id]  # define the drone to return using the index id
+
+        return drone_to_return
@@ -1,7 +1,7 @@
 from src.entities.uav_entities import Drone
 from src.mac_protocol.depot_mac import DepotMAC
-import numpy as np
-import math as mt  # necessary for math operations
+from src.mac_protocol.buffered_random import BufferedRandom
+from src.mac_protocol.bandit import UCBIndex
 
 """
 The class is responsable to allocate communication resources to neighbors drones that want to offload data to the depot.
@@ -13,10 +13,14 @@ class AIucb(DepotMAC):
 
     def __init__(self, simulator, depot):
         super().__init__(simulator, depot)
-        self.rnd_mac = np.random.RandomState(self.simulator.seed)
-        self.N = [1] * simulator.n_drones
-        self.Q = [17] * simulator.n_drones  # optimistic initial value --- (best ones)
-        self.epsilon = 0.2  # epsilon variable
+        self.rnd_mac = BufferedRandom(self.simulator.seed)
+        # discounted mean reward, number of rewards and UCB index of each drone
+        # the reward is the backlog of the drone, which changes at every allocation, so we keep about the last n_drones
+        # rewards (one round of the fleet), plain UCB1 (gamma = 1) never forgets and delivers less than AIncremental
+        # the bonus replaces the epsilon-greedy step and the optimistic initial Q (17): the drones never rewarded have
+        # an infinite index, so they are tried first
+        self.ucb = UCBIndex(simulator.n_drones, simulator.len_simulation, c=1,
+                            gamma=1 - 1 / max(2, simulator.n_drones))
 
     def allocate_resource_to_drone(self, drones: list, cur_step: int) -> Drone:
         """ Return the drone to who allocate bandwith for upload data in this step """
@@ -37,26 +41,11 @@ class AIucb(DepotMAC):
         elif transmission == False and feedback == 0:
             reward = 0
 
-        # we define the "exploitation" value
-        exploitation = self.Q[drone.identifier] = self.Q[drone.identifier] + (1 / self.N[drone.identifier]) * (reward - self.Q[drone.identifier])
-        # we define the "exploration" value
-        exploration = (mt.sqrt((mt.log(cur_step, mt.e)) / self.N[drone.identifier]))
-        c = 1  # parameter that controls the amount of exploration
+        # we update the "exploitation" value, the "exploration" value is added when the indices are computed
+        self.ucb.update(drone.identifier, reward)
 
-        self.Q[drone.identifier] = exploitation + c * exploration  # update the Qtable
-        rv = self.rnd_mac.rand()
+        # the drone with the highest upper confidence bound, drones never rewarded are tried first
+        drone_id = self.ucb.best_arm(self.rnd_mac)
+        drone_to_return = drones[drone_id]  # define the drone to return using the index id
 
-        if rv <= self.epsilon:  # random step with probability epsilon
-            drone_to_return = self.rnd_mac.choice(drones)  # choose a random drone
-
-        else:  # greedy step with probability 1 - epsilon
-
-            max_value = max(self.Q)  # search the best value in the Qtable
-            indices = [index for index, value in enumerate(self.Q) if value == max_value]
-            # take all the indices that have that best value (max_value)
-            drone_id = self.rnd_mac.choice(indices)  # choose a random index from the "best" ones
-            drone_to_return = drones[drone_id]  # define the drone to return using the index id
-
-        self.N[drone_to_return.identifier] += 1  # increment the counter that tell how many time we pick that drone
-
-        return drone_to_return
\ No newline at end of file
+        return drone_to_return
@@ -0,0 +1,80 @@
+import numpy as np
+
+"""
+Random source for the per-step decisions, with the same numbers of np.random.RandomState for the same seed.
+The 32 bit words of the generator are drawn from a RandomState in large blocks and served one at a time, which
+removes the per call overhead of RandomState, and they are turned into numbers with the algorithms of RandomState:
+ - random: a 53 bit double from two words, ((a >> 5) * 2^26 + (b >> 6)) / 2^53
+ - randint(low, high): a word masked to the smallest 2^k - 1 >= high - low - 1, drawn again while it is too large
+ - choice(seq): seq[randint(0, len(seq))]
+So each call returns what the RandomState call it replaces would return, and the decisions do not change.
+The file is copied in the hw1 and hw2 folders, since each one is dropped into a different simulator branch:
+the two copies must be kept identical.
+"""
+
+
+class BufferedRandom:
+
+    def __init__(self, seed, block_size: int = 4096):
+        self.rnd = np.random.RandomState(seed)
+        self.block_size = block_size
+        self.block: list = []  # current block of 32 bit words
+        self.position = 0  # next word to serve from the block
+
+    def _refill(self) -> None:
+        # one word of the generator for each value, as the draws of RandomState
+        self.block = self.rnd.randint(0, 2 ** 32, size=self.block_size, dtype=np.uint32).tolist()
+        self.position = 0
+
+    def _word(self) -> int:
+        if self.position == len(self.block):
+            self._refill()
+        word = self.block[self.position]
+        self.position += 1
+        return word
+
+    def _words(self, size: int) -> np.ndarray:
+        """ Return the next size words as an array """
+        words = np.empty(size, dtype=np.uint64)
+        filled = 0
+        while filled < size:
+            if self.position == len(self.block):
+                self._refill()
+            take = min(size - filled, len(self.block) - self.position)
+            words[filled:filled + take] = self.block[self.position:self.position + take]
+            self.position += take
+            filled += take
+        return words
+
+    def random(self) -> float:
+        """ Return a uniform number in [0, 1), as RandomState.random_sample() """
+        position = self.position
+        if position + 2 <= len(self.block):
+            self.position = position + 2
+            return ((self.block[position] >> 5) * 67108864.0 + (self.block[position + 1] >> 6)) / 9007199254740992.0
+        a = self._word() >> 5
+        return (a * 67108864.0 + (self._word() >> 6)) / 9007199254740992.0
+
+    rand = random
+
+    def random_block(self, size: int) -> np.ndarray:
+        """ Return the next size uniform numbers of the sequence as an array, as RandomState.random_sample(size) """
+        words = self._words(2 * size)
+        return ((words[0::2] >> 5).astype(np.float64) * 67108864.0 + (words[1::2] >> 6)) / 9007199254740992.0
+
+    def randint(self, low: int, high: int) -> int:
+        """ Return an integer in [low, high) uniform at random, as RandomState.randint(low, high) for ranges < 2^32 """
+        rng = int(high) - int(low) - 1
+        if rng < 0:
+            raise ValueError("low >= high")
+        if rng == 0:
+            return int(low)  # RandomState does not draw anything
+        mask = (1 << rng.bit_length()) - 1
+        value = self._word() & mask
+        while value > rng:
+            value = self._word() & mask
+        return int(low) + value
+
+    def choice(self, seq):
+        """ Return an element of the sequence uniform at random, as RandomState.choice(seq) """
+        return seq[self.randint(0, len(seq))]
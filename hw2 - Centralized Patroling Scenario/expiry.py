@@ -0,0 +1,48 @@
+from collections import deque
+
+"""
+Expiry of the bookkeeping that the routing policies keep for each event until all its feedback arrives.
+The feedback of a drone that delivers the event arrives before its deadline, the one of a drone that fails arrives
+at the deadline or later, so the bookkeeping of an event is kept for (1 + ttl_slack) event durations after the
+policy first handles it, and dropped earlier by the policy when all its feedback arrived.
+The slack is a margin and not a bound of the simulator, so what it costs is counted:
+ - dropped_feedback: drones still without feedback when the bookkeeping of their event is dropped
+ - late_feedback: feedback received for an event already dropped, within one more ttl after the drop
+A late_feedback above zero means that the slack is too short for the simulator and some feedback was lost.
+"""
+
+
+class EventExpiry:
+
+    def __init__(self, event_duration: int, ttl_slack: float = 1.0):
+        self.ttl: int = int((1 + ttl_slack) * event_duration)  # steps the bookkeeping of an event is kept
+        self.queue = deque()  # (eviction step, id_event) in order of eviction
+        self.dropped = deque()  # (forget step, id_event) of the dropped events, to recognize their late feedback
+        self.dropped_events: set = set()
+        self.dropped_feedback: int = 0
+        self.late_feedback: int = 0
+
+    def track(self, id_event: int, cur_step: int) -> None:
+        """ Start the ttl of an event, the policy calls it once, the first time it handles the event """
+        self.queue.append((cur_step + self.ttl, id_event))
+
+    def expired(self, cur_step: int) -> list:
+        """ Return the events whose ttl is over, the policy drops their bookkeeping and reports it with drop """
+        while self.dropped and self.dropped[0][0] < cur_step:
+            self.dropped_events.discard(self.dropped.popleft()[1])
+        events = []
+        while self.queue and self.queue[0][0] < cur_step:
+            events.append(self.queue.popleft()[1])
+        return events
+
+    def drop(self, id_event: int, pending: int, cur_step: int) -> None:
+        """ The bookkeeping of the event was dropped with pending drones still without feedback """
+        self.dropped_feedback += pending
+        if pending > 0:
+            self.dropped.append((cur_step + self.ttl, id_event))
+            self.dropped_events.add(id_event)
+
+    def unknown_feedback(self, id_event: int) -> None:
+        """ The policy received a feedback for an event without bookkeeping """
+        if id_event in self.dropped_events:
+            self.late_feedback += 1
@@ -0,0 +1,120 @@
+import json
+import time
+
+import numpy as np
+
+"""
+Metrics of the routing policies of drone zero, written as JSON lines.
+A record every period simulation steps with: decision latency of relay_selection, feedback delay distribution,
+size of the q table, exploration ratio in the period, number of pending events and feedback lost to their expiry.
+The metrics wrap the methods of the policy instance when they are enabled, so a disabled run has no overhead.
+"""
+
+
+class Histogram:
+    """
+    Counts of the values in power of two buckets: bucket 0 holds values < 1 = 2^0, bucket i values in [2^(i-1), 2^i).
+    In the records each bucket is labelled by its upper bound.
+    """
+
+    def __init__(self, n_buckets: int = 32):
+        self.buckets = [0] * n_buckets
+        self.count: int = 0
+        self.total: float = 0
+        self.max: float = 0
+
+    def add(self, value: float) -> None:
+        self.buckets[min(int(value).bit_length(), len(self.buckets) - 1)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def to_dict(self) -> dict:
+        return {'count': self.count,
+                'mean': self.total / self.count if self.count > 0 else 0.0,
+                'max': self.max,
+                'buckets': {2 ** i: n for i, n in enumerate(self.buckets) if n > 0}}
+
+    def reset(self) -> None:
+        self.buckets = [0] * len(self.buckets)
+        self.count, self.total, self.max = 0, 0, 0
+
+
+class RoutingMetrics:
+
+    def __init__(self, path: str, period: int = 1000):
+        self.file = open(path, 'a')
+        self.period = period  # simulation steps between two records
+        self.next_record: int = period
+
+        self.latency_us = Histogram()  # time spent in each relay_selection
+        self.batch_latency_us = Histogram()  # time spent in each relay_selection_batch
+        self.feedback_delay = Histogram()  # delay of the feedback received
+        self.last_exploration: int = 0  # counters of the policy at the previous record
+        self.last_exploitation: int = 0
+        self.last_dropped_feedback: int = 0
+        self.last_late_feedback: int = 0
+
+    def attach(self, policy) -> None:
+        """ Wrap relay_selection, relay_selection_batch and feedback of the given policy instance """
+        relay_selection, relay_selection_batch, feedback = \
+            policy.relay_selection, policy.relay_selection_batch, policy.feedback
+        clock = time.perf_counter
+
+        def timed_relay_selection(opt_neighbors, pkd):
+            start = clock()
+            action = relay_selection(opt_neighbors, pkd)
+            self.latency_us.add((clock() - start) * 1e6)
+            if policy.simulator.cur_step >= self.next_record:
+                self.record(policy)
+            return action
+
+        def timed_relay_selection_batch(opt_neighbors, packets):
+            start = clock()
+            actions = relay_selection_batch(opt_neighbors, packets)
+            self.batch_latency_us.add((clock() - start) * 1e6)
+            if policy.simulator.cur_step >= self.next_record:
+                self.record(policy)
+            return actions
+
+        def counted_feedback(drone, id_event, delay, outcome):
+            self.feedback_delay.add(delay)
+            return feedback(drone, id_event, delay, outcome)
+
+        policy.relay_selection = timed_relay_selection
+        policy.relay_selection_batch = timed_relay_selection_batch
+        policy.feedback = counted_feedback
+
+    def record(self, policy) -> None:
+        """ Write a record with the metrics since the previous one """
+        exploration = policy.count_exploration - self.last_exploration
+        exploitation = policy.count_exploitation - self.last_exploitation
+        known_drones: np.ndarray = policy.known_drones[policy.known_drones > 0]
+
+        self.file.write(json.dumps({
+            'step': policy.simulator.cur_step,
+            'policy': type(policy).__name__,
+            'latency_us': self.latency_us.to_dict(),
+            'batch_latency_us': self.batch_latency_us.to_dict(),
+            'feedback_delay': self.feedback_delay.to_dict(),
+            'exploration_ratio': exploration / (exploration + exploitation) if exploration + exploitation > 0 else 0.0,
+            'pending_events': len(policy.already_taken_actions),
+            'tracked_events': len(policy.store_timestep_id_event),
+            # drones without feedback when their event expired, and feedback received after it (see expiry.py)
+            'dropped_feedback': policy.expiry.dropped_feedback - self.last_dropped_feedback,
+            'late_feedback': policy.expiry.late_feedback - self.last_late_feedback,
+            'known_cells': len(known_drones),
+            'known_drones_per_cell': {'mean': float(known_drones.mean()) if len(known_drones) > 0 else 0.0,
+                                      'max': int(known_drones.max()) if len(known_drones) > 0 else 0},
+            'q_table_bytes': policy.q_table.nbytes}) + '\n')
+
+        self.last_exploration, self.last_exploitation = policy.count_exploration, policy.count_exploitation
+        self.last_dropped_feedback, self.last_late_feedback = policy.expiry.dropped_feedback, policy.expiry.late_feedback
+        self.latency_us.reset()
+        self.batch_latency_us.reset()
+        self.feedback_delay.reset()
+        self.next_record = (policy.simulator.cur_step // self.period + 1) * self.period
+
+    def close(self, policy) -> None:
+        self.record(policy)
+        self.file.close()
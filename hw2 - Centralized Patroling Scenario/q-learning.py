@@ -1,39 +1,146 @@
+import os
 from typing import List, Set
 
 import numpy as np
 from src.utilities import utilities as util
 from src.routing_algorithms.BASE_routing import BASE_routing
+from src.routing_algorithms.buffered_random import BufferedRandom
+from src.routing_algorithms.expiry import EventExpiry
+from src.routing_algorithms.metrics import RoutingMetrics
+from src.routing_algorithms.ranking import RelayRanking
 from matplotlib import pyplot as plt
 
 
 class QLEARNING(BASE_routing):
-    def __init__(self, drone, simulator):
+    # hyperparameters, they can be overridden in a subclass (see sweep.py)
+    initial_q_value: float = 0
+    epsilon: float = 0.98  # we explore an already explored state with probability 1 - epsilon
+    alpha: float = 0.50  # learning rate
+
+    warm_start_epsilon: float = 0.995  # epsilon used when the q table comes from a snapshot
+    metrics_period: int = 1000  # simulation steps between two metrics records
+    ttl_slack: float = 1.0  # event durations the bookkeeping of an event is kept after its deadline (see expiry.py)
+
+    def __init__(self, drone, simulator, snapshot_path: str = None, metrics_path: str = None):
+        '''
+        snapshot_path: npz file with the q table of a previous run, if it exists the q table is loaded and we explore
+        less, at the end of the run the q table is saved there. metrics_path: JSON lines file of the metrics (see
+        metrics.py). When they are not given they are read from simulator.routing_snapshot_path and
+        simulator.routing_metrics_path, None disables them. The simulator builds the policy with (drone, simulator),
+        so to pass them to the constructor use functools.partial(QLEARNING, snapshot_path="q_learning.npz") as routing class.
+        Every drone builds its own policy, only the one of drone zero (the drone that routes) loads, saves and measures.
+        '''
         BASE_routing.__init__(self, drone, simulator)
         # random generator
-        self.rnd_for_routing_ai = np.random.RandomState(self.simulator.seed)
+        self.rnd_for_routing_ai = BufferedRandom(self.simulator.seed)
         self.taken_actions = {}  # id event : (old_state, old_action)
 
         self.drone_zero = drone
-        self.q_table: dict = {}  # cell -> drone -> q table value
+        # cell x drone id -> q table value, initial_q_value until the first feedback
+        n_cells: int = int(np.ceil(self.simulator.env_width / self.simulator.prob_size_cell)) * \
+                       int(np.ceil(self.simulator.env_height / self.simulator.prob_size_cell))
+        self.q_table = np.full((n_cells, self.simulator.n_drones), float(self.initial_q_value))
+        self.known_drones = np.zeros(n_cells, dtype=np.int64)  # cell -> number of drones with a feedback
+        # cell x drone id -> position of the first feedback of the drone among the ones of the cell, it breaks the ties
+        self.feedback_order = np.zeros((n_cells, self.simulator.n_drones), dtype=np.int64)
+        self.cell_cache: dict = {}  # coords of drone zero -> cell
+        self.cell_cache_size: int = 100000
+        # cell -> heap of the drones that can be chosen, from the best q value, updated at each feedback
+        self.ranking = RelayRanking()
+        self.q_known = np.zeros((n_cells, self.simulator.n_drones), dtype=bool)  # cell x drone id -> has a feedback
 
         self.already_taken_actions = {}  # id_event (int) : {cella, set(droni assegnati))
 
         self.store_timestep_id_event = dict()  # id_event : (cella: timestep)
 
-        self.time_step = 0
-
-        self.epsilon: float = 0.98
+        # (id_event, drone) -> first cell, in time, in which the drone was assigned to the event
+        self.event_drone_cell = dict()
 
-        self.alpha: float = 0.50
+        self.expiry = EventExpiry(self.simulator.event_duration, self.ttl_slack)
 
-        self.initial_q_value = 0
+        self.time_step = 0
 
         # for metrics purpose
         self.count_exploration: int = 0
         self.count_exploitation: int = 0
 
-    def _get_key_min_max_dictiory(self, dictionary, func):
-        return func(dictionary.items(), key=lambda x: x[1])[0]
+        owner: bool = drone.identifier == 0
+        self.snapshot_path: str = (snapshot_path or getattr(simulator, 'routing_snapshot_path', None)) if owner else None
+        self.metrics_path: str = (metrics_path or getattr(simulator, 'routing_metrics_path', None)) if owner else None
+
+        if self.snapshot_path is not None and os.path.exists(self.snapshot_path):
+            self._load_snapshot(self.snapshot_path)
+
+        self.metrics: RoutingMetrics = None
+        if self.metrics_path is not None:
+            self.metrics = RoutingMetrics(self.metrics_path, self.metrics_period)
+            self.metrics.attach(self)
+
+    def _save_snapshot(self, path: str) -> None:
+        '''save the q table and its counters, the file is not compressed so it loads quickly also for large grids'''
+        np.savez(path, q_table=self.q_table, known_drones=self.known_drones, feedback_order=self.feedback_order, q_known=self.q_known)
+
+    def _load_snapshot(self, path: str) -> None:
+        '''warm start from a previous run, the snapshot is ignored if it was taken with a different number of drones'''
+        with np.load(path) as snapshot:
+            if snapshot['q_table'].shape[1] != self.simulator.n_drones:
+                print("snapshot", path, "ignored, it has", snapshot['q_table'].shape[1], "drones")
+                return
+            n_cells = len(self.q_table)
+            self.q_table = snapshot['q_table']
+            self.q_known = snapshot['q_known']
+            self.known_drones = snapshot['known_drones']
+            # the ties of the rebuilt ranking follow the first feedback order, by drone id for older snapshots
+            self.feedback_order = snapshot['feedback_order'] if 'feedback_order' in snapshot.files else np.zeros(self.q_table.shape, dtype=np.int64)
+        self._build_ranking()
+        self._ensure_cell(n_cells - 1)  # the snapshot can come from a smaller area
+        self.epsilon = self.warm_start_epsilon
+
+    def _get_cell(self) -> int:
+        '''
+        Return the cell of drone zero. Drone zero follows a stationary path, so the same coordinates repeat
+        and coord_to_cell is called only the first time we see them.
+        '''
+        coords = (self.drone.coords[0], self.drone.coords[1])
+        cell = self.cell_cache.get(coords)
+        if cell is None:
+            if len(self.cell_cache) >= self.cell_cache_size:
+                self.cell_cache.clear()  # the path is not stationary, we avoid to grow forever
+            cell = int(util.TraversedCells.coord_to_cell(size_cell=self.simulator.prob_size_cell, width_area=self.simulator.env_width, x_pos=coords[0], y_pos=coords[1])[0])
+            self.cell_cache[coords] = cell
+        return cell
+
+    def _ensure_cell(self, cell: int) -> None:
+        '''the q_table grows if a cell is out of the expected area'''
+        if cell >= len(self.q_table):
+            rows = max(cell + 1, 2 * len(self.q_table))
+            n_drones = self.q_table.shape[1]
+            self.q_table = np.vstack([self.q_table, np.full((rows - len(self.q_table), n_drones), float(self.initial_q_value))])
+            self.q_known = np.vstack([self.q_known, np.zeros((rows - len(self.q_known), n_drones), dtype=bool)])
+            self.known_drones = np.concatenate([self.known_drones, np.zeros(rows - len(self.known_drones), dtype=np.int64)])
+            self.feedback_order = np.vstack([self.feedback_order, np.zeros((rows - len(self.feedback_order), self.feedback_order.shape[1]), dtype=np.int64)])
+
+    def _ranking_key(self, value: float):
+        '''the ranking is sorted from the highest q value, drones still at the initial q value are not in the ranking'''
+        return -value if value != self.initial_q_value else None
+
+    def _update_ranking(self, cell: int, drone_id: int, value: float) -> None:
+        '''move the drone in the ranking of the cell after a change of its q value, O(log k) amortized'''
+        self.ranking.update(cell, drone_id, self._ranking_key(value), int(self.feedback_order[cell, drone_id]))
+
+    def _build_ranking(self) -> None:
+        '''rebuild the ranking of every cell from the q_table, with the same keys of _update_ranking'''
+        self.ranking = RelayRanking()
+        for cell, drone_id in zip(*np.nonzero(self.q_table != self.initial_q_value)):
+            self._update_ranking(int(cell), int(drone_id), self.q_table[cell, drone_id])
+
+    def _best_relay(self, cell: int, neighbors: dict) -> int:
+        '''
+        Return the id of the neighbour with the highest q value in the cell, None if no neighbour ever succeeded.
+        Drones still at the initial q value, with or without feedback, are not in the ranking.
+        We walk the heap of the cell in order up to the first neighbour, ties are broken by the order of the first feedback in the cell, as the stable sort of the q table did.
+        '''
+        return self.ranking.best(cell, neighbors)
 
     def _get_right_cell_feedback(self, drone, id_event) -> int:
 
@@ -41,43 +148,34 @@ class QLEARNING(BASE_routing):
         This function is used to calculate the right cell for a drone in a particular id_event
         knowning that id_event can be sent in different cell
         '''
-        list_state_explored = list(self.already_taken_actions[id_event].keys())
-        if len(list_state_explored) == 1:
+        cells_explored: dict = self.already_taken_actions[id_event]
+        if len(cells_explored) == 1:
             '''
             (Base) Case in which the id_event is not sent in different cell
             '''
-            unique_state = list_state_explored[0]
+            unique_state = next(iter(cells_explored))
             return unique_state
 
         '''
         Case in which the id_event is sent over multiple cell
-        We find the right cell for the drone given in input.
+        The drone gets the feedback of the first cell in which it was assigned to the id_event,
+        _store_action keeps this cell for each (id_event, drone), so we only need a lookup.
         '''
+        return self.event_drone_cell.get((id_event, drone))
 
-        seen = []
-        for state in list_state_explored:
-            if drone in self.already_taken_actions[id_event][state]:
-                seen.append(state)
-        if len(seen) == 1:
-            '''
-            Drone x is found in only one cell, so there's no inference
-            '''
-            unique_state = seen[0]
-            return unique_state
-        else:
-            '''
-            Case in which Drone x is reached in multiple cell for the same id_event
-            we assign the drone in the first cell seen for giving priority.
-            '''
-            # there is overlap
-            first_timestep = float("inf")
-            best_state = None
-            for state in seen:
-                timestep = self.store_timestep_id_event[id_event][state]
-                if timestep < first_timestep:
-                    best_state = state
-                    first_timestep = timestep
-            return best_state
+    def _evict_expired_events(self) -> None:
+        '''
+        We remove the bookkeeping of the events whose ttl is over (see expiry.py), the drones still without feedback
+        are counted as dropped. The expiry queue is ordered by time, so we only look at its head.
+        '''
+        for id_event in self.expiry.expired(self.simulator.cur_step):
+            self.store_timestep_id_event.pop(id_event, None)
+            pending: set = set()
+            for drones in self.already_taken_actions.pop(id_event, {}).values():
+                pending.update(drones)
+            for drone in pending:
+                self.event_drone_cell.pop((id_event, drone), None)
+            self.expiry.drop(id_event, len(pending), self.simulator.cur_step)
 
     def feedback(self, drone, id_event, delay, outcome):
 
@@ -85,19 +183,25 @@ class QLEARNING(BASE_routing):
             # we skip all feedback related to drone zero
             return None
 
-        cell: int = self._get_right_cell_feedback(drone=drone, id_event=id_event)  # take the right cell
-
         reward = self.simulator.event_duration - delay
 
         if id_event in self.already_taken_actions:
 
-            if drone not in self.q_table[cell]:
-                # if the first time, initialize the q_table for the given cell
-                self.q_table[cell][drone] = 0
+            cell: int = self._get_right_cell_feedback(drone=drone, id_event=id_event)  # take the right cell
 
-            self.q_table[cell][drone] += self.alpha * (reward - self.q_table[cell][drone])
+            if not self.q_known[cell, drone.identifier]:
+                # if the first time, the q_table for the given cell is already at initial_q_value
+                self.q_known[cell, drone.identifier] = True
+                self.feedback_order[cell, drone.identifier] = self.known_drones[cell]
+                self.known_drones[cell] += 1
+
+            old_value = self.q_table[cell, drone.identifier]
+            self.q_table[cell, drone.identifier] += self.alpha * (reward - old_value)
+            self._update_ranking(cell, drone.identifier, self.q_table[cell, drone.identifier])
 
             self._clean_already_taken_action(id_event, cell, drone)  # we remove the old id_event for which we have already received all feedback
+        else:
+            self.expiry.unknown_feedback(id_event)  # counted as late if we dropped the event too early
 
     def _store_action(self, id_event: int, cell: int, action) -> None:
         if id_event not in self.already_taken_actions:
@@ -108,6 +212,11 @@ class QLEARNING(BASE_routing):
             else:
                 self.already_taken_actions[id_event][cell] = {action}
 
+        # we keep the first cell seen for the drone, the one that gets its feedback
+        first_cell = self.event_drone_cell.get((id_event, action))
+        if first_cell is None or self.store_timestep_id_event[id_event][cell] < self.store_timestep_id_event[id_event][first_cell]:
+            self.event_drone_cell[(id_event, action)] = cell
+
     def _clean_already_taken_action(self, id_event, cell, drone):
         ''''we remove the old id_event for which we have already received all feedback'''
         self.already_taken_actions[id_event][cell].remove(drone)
@@ -116,10 +225,19 @@ class QLEARNING(BASE_routing):
             if len(self.already_taken_actions[id_event].keys()) == 0:
                 del self.already_taken_actions[id_event]
 
+        # the drone can still be assigned to the event in other cells (rare), otherwise we forget it
+        if self.event_drone_cell.get((id_event, drone)) == cell:
+            remaining = [state for state, drones in self.already_taken_actions.get(id_event, {}).items() if drone in drones]
+            if len(remaining) == 0:
+                del self.event_drone_cell[(id_event, drone)]
+            else:
+                self.event_drone_cell[(id_event, drone)] = min(remaining, key=lambda state: self.store_timestep_id_event[id_event][state])
+
     def _store_map_event_to_cell(self, id_event: int, cell: int) -> None:
         if id_event not in self.store_timestep_id_event:
             # insert the first map between event -> cell -> timestep
             self.store_timestep_id_event[id_event] = {cell: self.time_step}
+            self.expiry.track(id_event, self.simulator.cur_step)
         elif cell not in self.store_timestep_id_event[id_event]:
             # we add another cell
             self.store_timestep_id_event[id_event][cell] = self.time_step
@@ -128,21 +246,21 @@ class QLEARNING(BASE_routing):
         """ arg min score  -> geographical approach, take the drone closest to the depot """
 
         self.time_step += 1  # moving on time_step
+        self._evict_expired_events()
 
         id_event: int = pkd.event_ref.identifier  # refactor for id_event
 
         id_set_neighbors: Set[int] = {v[1] for v in opt_neighbors}  # set of drone id
 
-        cell: int = int(util.TraversedCells.coord_to_cell(size_cell=self.simulator.prob_size_cell, width_area=self.simulator.env_width, x_pos=self.drone.coords[0], y_pos=self.drone.coords[1])[0])
+        cell: int = self._get_cell()
 
         self._store_map_event_to_cell(id_event, cell)
 
-        if cell not in self.q_table:
-            self.q_table[cell] = {}
+        self._ensure_cell(cell)
 
         epsilon_choice: bool = self.rnd_for_routing_ai.random() > self.epsilon
 
-        no_prior_knowledge_on_state: bool = len(self.q_table[cell].keys()) == 0  # la q table per una cella è vuota, quindi devo esplorare
+        no_prior_knowledge_on_state: bool = self.known_drones[cell] == 0  # la q table per una cella è vuota, quindi devo esplorare
 
         we_do_exploration: bool = id_event in self.already_taken_actions and cell in self.already_taken_actions[id_event]
 
@@ -172,25 +290,69 @@ class QLEARNING(BASE_routing):
             # exploitation
             self.count_exploitation += 1
 
-            sorted_x = sorted(self.q_table[cell].items(), key=lambda kv: kv[1], reverse=True)
-
-            best_action = None
-
-            for best_drone, value in sorted_x:
-                is_drone_successfull: bool = value != self.initial_q_value
-                if best_drone in id_set_neighbors and is_drone_successfull:
-                    # we take the best drone w.r.t q-table and we discard the unsucessfull drones, which never get a success.
-
-                    best_action = best_drone
-                    break
+            # we take the best drone w.r.t q-table among the neighbours and we discard the unsucessfull drones, which never get a success.
+            neighbors = {d.identifier: d for d in id_set_neighbors}
+            best_id = self._best_relay(cell, neighbors)
 
-            if best_action is None:
+            if best_id is None:
                 return None  # no action
+            best_action = neighbors[best_id]
 
             self._store_action(id_event=id_event, action=best_action, cell=cell)
 
             return best_action  # return drone id
 
+    def relay_selection_batch(self, opt_neighbors, packets) -> list:
+        """
+        Relay decision for all the packets in the buffer of drone zero at once, with the rules of relay_selection.
+        The q table does not change without feedback, so cell, neighbours and best relay are computed once,
+        only the exploration is done packet by packet since it depends on the drones already assigned to each event.
+        """
+
+        self._evict_expired_events()
+        id_set_neighbors: Set[int] = {v[1] for v in opt_neighbors}  # set of drone id
+
+        cell: int = self._get_cell()
+
+        self._ensure_cell(cell)  # grow the q_table for the given cell if needed
+
+        epsilon_choices: list = (self.rnd_for_routing_ai.random_block(len(packets)) > self.epsilon).tolist()
+        no_prior_knowledge_on_state: bool = self.known_drones[cell] == 0
+
+        best_action = None  # the exploitation choice, the same for all the packets
+        if not no_prior_knowledge_on_state:
+            neighbors = {d.identifier: d for d in id_set_neighbors}
+            best_id = self._best_relay(cell, neighbors)
+            best_action = neighbors[best_id] if best_id is not None else None
+
+        actions = []
+        for pkd, epsilon_choice in zip(packets, epsilon_choices):
+            self.time_step += 1  # moving on time_step, one step for each packet as in relay_selection
+            id_event: int = pkd.event_ref.identifier
+
+            self._store_map_event_to_cell(id_event, cell)
+
+            already_explored: set = self.already_taken_actions.get(id_event, {}).get(cell)
+
+            if no_prior_knowledge_on_state or (already_explored is not None and epsilon_choice):
+                self.count_exploration += 1
+                # exploration, we skip the drones already explored for the event in this cell
+                set_id_drone_to_explore = id_set_neighbors if already_explored is None else id_set_neighbors.difference(already_explored)
+                if len(set_id_drone_to_explore) == 0:
+                    actions.append(None)  # no action
+                    continue
+                action = self.rnd_for_routing_ai.choice(list(set_id_drone_to_explore))
+            else:
+                # exploitation
+                self.count_exploitation += 1
+                action = best_action
+
+            if action is not None:
+                self._store_action(id_event=id_event, action=action, cell=cell)
+            actions.append(action)
+
+        return actions
+
     def print(self):
         """
             This method is called at the end of the simulation, can be usefull to print some
@@ -198,4 +360,8 @@ class QLEARNING(BASE_routing):
         """
         print("q table", self.q_table)
         print("EXPLOITATION", self.count_exploitation)
-        print("EXPLORATION -> ", self.count_exploration)
\ No newline at end of file
+        print("EXPLORATION -> ", self.count_exploration)
+        if self.snapshot_path is not None:
+            self._save_snapshot(self.snapshot_path)
+        if self.metrics is not None:
+            self.metrics.close(self)
\ No newline at end of file
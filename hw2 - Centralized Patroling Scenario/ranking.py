@@ -0,0 +1,65 @@
+import heapq
+
+"""
+Ranking of the relays of each cell for the exploitation step of the routing policies.
+The drones of a cell are kept in a binary heap of (key, order, drone id), the lowest key is the best relay and the
+order (first feedback of the drone in the cell) breaks the ties. A change of key pushes a new entry in O(log k) and
+leaves the old one in the heap: an entry is valid only while its key is the current key of the drone, and the heap
+is compacted when the invalid entries are more than the valid ones, so the amortized cost of an update stays O(log k).
+The best neighbour is found walking the heap in order from the root with a second heap of the frontier, so the cost
+is O(m log m) for the m entries seen before the first neighbour, and the ranking is not modified.
+"""
+
+
+class RelayRanking:
+
+    def __init__(self):
+        self.heaps: dict = {}  # cell -> heap of (key, order, drone id)
+        self.keys: dict = {}  # cell -> {drone id: current key} of the drones in the ranking
+
+    def update(self, cell: int, drone_id: int, key, order: int) -> None:
+        """ Set the key of a drone in the cell, None removes the drone from the ranking """
+        keys: dict = self.keys.setdefault(cell, {})
+        if keys.get(drone_id) == key:
+            return
+        heap: list = self.heaps.setdefault(cell, [])
+        if key is None:
+            del keys[drone_id]
+        else:
+            keys[drone_id] = key
+            heapq.heappush(heap, (key, order, drone_id))
+        if len(heap) > 2 * len(keys) + 16:
+            self._compact(cell)
+
+    def _compact(self, cell: int) -> None:
+        """ Drop the invalid and repeated entries of the heap of the cell """
+        keys: dict = self.keys[cell]
+        entries, seen = [], set()
+        for entry in self.heaps[cell]:
+            if keys.get(entry[2]) == entry[0] and entry[2] not in seen:
+                seen.add(entry[2])
+                entries.append(entry)
+        heapq.heapify(entries)
+        self.heaps[cell] = entries
+
+    def best(self, cell: int, candidates) -> int:
+        """ Return the id of the best drone of the cell among the candidates, None if no candidate is ranked """
+        heap: list = self.heaps.get(cell)
+        if not heap:
+            return None
+        keys: dict = self.keys[cell]
+        frontier = [(heap[0], 0)]
+        while frontier:
+            (key, _, drone_id), i = heapq.heappop(frontier)
+            if drone_id in candidates and keys.get(drone_id) == key:
+                return drone_id
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return None
+
+    def ranked(self, cell: int) -> list:
+        """ The drones of the cell from the best one """
+        keys: dict = self.keys.get(cell, {})
+        order: dict = {drone_id: entry_order for _, entry_order, drone_id in self.heaps.get(cell, ())}
+        return sorted(keys, key=lambda drone_id: (keys[drone_id], order[drone_id], drone_id))
@@ -0,0 +1,125 @@
+import argparse
+import importlib
+import itertools
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+Parallel hyperparameter sweep of the routing policies with successive halving.
+All the configurations of the grid run a short simulation, only the best 1 / eta go on to a run eta times longer,
+and so on up to the full length, so most of the budget is spent on the promising configurations.
+A configuration is a dict with the name of the policy and the values of its hyperparameters (class attributes), e.g.
+    {'policy': 'QLEARNING', 'alpha': 0.5, 'epsilon': 0.98, 'initial_q_value': 0}
+The simulation is run by a user supplied function evaluate(config, len_simulation, seed) -> dict, it must return
+the 'delivery_ratio' and the 'mean_delay' of the run. It is given as module:function and imported in each worker,
+routing_class(config) returns the policy class to give to the simulator. Example:
+    python sweep.py --evaluate my_runs:evaluate --grid '{"policy": ["QLEARNING"], "alpha": [0.1, 0.5, 0.9]}'
+"""
+
+POLICIES = {'AI': 'ai', 'QLEARNING': 'q-learning', 'TileCodingQLEARNING': 'tile_coding'}
+
+
+def routing_class(config: dict):
+    """ Return a subclass of the policy of the configuration with its hyperparameters """
+    policy_cls = getattr(importlib.import_module('src.routing_algorithms.' + POLICIES[config['policy']]),
+                         config['policy'])
+    hyperparameters = {k: v for k, v in config.items() if k != 'policy'}
+    for name in hyperparameters:
+        if not hasattr(policy_cls, name):
+            raise ValueError("%s has no hyperparameter %s" % (config['policy'], name))
+    return type(policy_cls.__name__, (policy_cls,), hyperparameters)
+
+
+def grid_configs(grid: dict) -> list:
+    """ All the combinations of the values of the grid, e.g. {'alpha': [0.1, 0.5], 'epsilon': [0.9, 0.98]} """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _run(evaluate_path: str, config: dict, len_simulation: int, seeds: list) -> dict:
+    """ Worker: mean delivery ratio and delay of a configuration over the seeds """
+    module, function = evaluate_path.split(':')
+    evaluate = getattr(importlib.import_module(module), function)
+    runs = [evaluate(config, len_simulation, seed) for seed in seeds]
+    return {'delivery_ratio': sum(r['delivery_ratio'] for r in runs) / len(runs),
+            'mean_delay': sum(r['mean_delay'] for r in runs) / len(runs)}
+
+
+def rank(results: list) -> list:
+    """
+    Sort the results from the best one: each result gets its position by delivery ratio (higher is better) and
+    by mean delay (lower is better), we sort by the sum of the two positions and break ties by delivery ratio.
+    """
+    by_ratio = sorted(range(len(results)), key=lambda i: -results[i]['delivery_ratio'])
+    by_delay = sorted(range(len(results)), key=lambda i: results[i]['mean_delay'])
+    score = [0] * len(results)
+    for position, i in enumerate(by_ratio):
+        score[i] += position
+    for position, i in enumerate(by_delay):
+        score[i] += position
+    order = sorted(range(len(results)), key=lambda i: (score[i], -results[i]['delivery_ratio']))
+    return [results[i] for i in order]
+
+
+def successive_halving(evaluate_path: str, configs: list, min_len: int, max_len: int, eta: int = 3,
+                       seeds: list = (0,), workers: int = None) -> list:
+    """
+    Run the sweep and return the ranked results of the last rung of each configuration,
+    the configurations that reached the full length come first.
+    """
+    if eta < 2:
+        raise ValueError("eta must be at least 2, got %s" % eta)
+    n_rungs = 0  # lengths min_len * eta ** rung up to max_len, counted with integers since a float log can miss one
+    while min_len * eta ** n_rungs <= max_len:
+        n_rungs += 1
+    n_rungs = max(1, n_rungs)
+    survivors = configs
+    report = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for rung in range(n_rungs):
+            len_simulation = max_len if rung == n_rungs - 1 else min_len * eta ** rung
+            start = time.perf_counter()
+            futures = [pool.submit(_run, evaluate_path, config, len_simulation, list(seeds)) for config in survivors]
+            results = rank([dict(f.result(), config=config, rung=rung, len_simulation=len_simulation)
+                            for config, f in zip(survivors, futures)])
+            print("rung %d: %d configurations, len_simulation=%d, %.1fs" % (
+                rung, len(results), len_simulation, time.perf_counter() - start))
+
+            keep = len(results) if rung == n_rungs - 1 else max(1, len(results) // eta)
+            report = results[keep:] + report  # the pruned configurations go after the ones that went further
+            survivors = [r['config'] for r in results[:keep]]
+    return results + report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep of the routing policies")
+    parser.add_argument('--evaluate', required=True, help="module:function that runs a simulation")
+    parser.add_argument('--grid', required=True, help="JSON dict hyperparameter -> list of values")
+    parser.add_argument('--min-len', type=int, default=2000, help="simulation length of the first rung")
+    parser.add_argument('--max-len', type=int, default=18000, help="simulation length of the last rung")
+    parser.add_argument('--eta', type=int, default=3, help="only 1 / eta configurations go to the next rung")
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--workers', type=int, default=None, help="processes, all the cores by default")
+    parser.add_argument('--output', default='sweep_results.json')
+    args = parser.parse_args()
+
+    grid = json.loads(args.grid)
+    grid.setdefault('policy', ['QLEARNING'])
+    configs = grid_configs(grid)
+    for config in configs:
+        routing_class(config)  # fail before starting if a hyperparameter does not exist
+
+    report = successive_halving(args.evaluate, configs, args.min_len, args.max_len, args.eta, args.seeds,
+                                args.workers)
+    for position, result in enumerate(report):
+        print("%3d. delivery_ratio=%.4f mean_delay=%8.2f len_simulation=%-6d %s" % (
+            position + 1, result['delivery_ratio'], result['mean_delay'], result['len_simulation'],
+            json.dumps(result['config'])))
+    with open(args.output, 'w') as f:
+        json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'grid': grid, 'results': report}, f, indent=2)
+    print("results saved in", args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+"""
+This folder is src.routing_algorithms of the simulator. Without the simulator the folder is registered as that
+package, so the modules that do not import the simulator can be tested; the tests of the routing classes are skipped.
+The folders of the homeworks map src to different files, so the src modules of this folder are kept apart and put
+back in sys.modules for each of its tests.
+"""
+
+FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _src_modules() -> dict:
+    return {name: module for name, module in sys.modules.items() if name == 'src' or name.startswith('src.')}
+
+
+def _install() -> dict:
+    for name in _src_modules():
+        del sys.modules[name]
+    try:
+        importlib.import_module('src.routing_algorithms')
+    except ImportError:
+        for name, path in (('src', []), ('src.routing_algorithms', [FOLDER])):
+            module = types.ModuleType(name)
+            module.__path__ = path
+            sys.modules[name] = module
+    return _src_modules()
+
+
+SRC = _install()
+
+
+def pytest_itemcollected(item):
+    # the modules imported by the tests of this folder while they are collected
+    SRC.update(_src_modules())
+
+
+@pytest.fixture(autouse=True)
+def src_modules():
+    """ The src modules of this folder during each test, the modules imported by the test are kept """
+    others = _src_modules()
+    for name in others:
+        del sys.modules[name]
+    sys.modules.update(SRC)
+    yield
+    SRC.update(_src_modules())
+    for name in _src_modules():
+        del sys.modules[name]
+    sys.modules.update(others)
@@ -0,0 +1,12 @@
+import os
+
+from conftest import FOLDER
+
+
+def test_same_file_as_hw1():
+    # the tests of the random source are in the hw1 folder, the two copies must be kept identical
+    with open(os.path.join(FOLDER, 'buffered_random.py'), 'rb') as f:
+        routing_copy = f.read()
+    with open(os.path.join(os.path.dirname(FOLDER), 'hw1 - Centralized MAC', 'buffered_random.py'), 'rb') as f:
+        mac_copy = f.read()
+    assert routing_copy == mac_copy
@@ -0,0 +1,37 @@
+from src.routing_algorithms.expiry import EventExpiry
+
+
+def test_events_expire_after_the_ttl():
+    expiry = EventExpiry(event_duration=10, ttl_slack=0.5)
+    assert expiry.ttl == 15
+    expiry.track(1, cur_step=0)
+    expiry.track(2, cur_step=4)
+    expiry.track(3, cur_step=4)
+    assert expiry.expired(15) == []
+    assert expiry.expired(16) == [1]
+    assert expiry.expired(19) == []
+    assert expiry.expired(20) == [2, 3]
+    assert expiry.expired(100) == []
+
+
+def test_dropped_and_late_feedback():
+    expiry = EventExpiry(event_duration=10)
+    expiry.track(1, cur_step=0)
+    expiry.track(2, cur_step=0)
+    for id_event, pending in zip(expiry.expired(21), (2, 0)):
+        expiry.drop(id_event, pending, cur_step=21)
+    assert expiry.dropped_feedback == 2
+
+    # the feedback of an event dropped with pending drones is late, the one of an event never seen is not
+    expiry.unknown_feedback(1)
+    expiry.unknown_feedback(2)
+    expiry.unknown_feedback(7)
+    assert expiry.late_feedback == 1
+
+    # an event dropped is forgotten after one more ttl
+    expiry.expired(41)
+    expiry.unknown_feedback(1)
+    assert expiry.late_feedback == 2
+    expiry.expired(42)
+    expiry.unknown_feedback(1)
+    assert expiry.late_feedback == 2
@@ -0,0 +1,65 @@
+import json
+import types
+
+import numpy as np
+
+from src.routing_algorithms.expiry import EventExpiry
+from src.routing_algorithms.metrics import Histogram, RoutingMetrics
+
+
+def test_histogram_buckets_are_labelled_by_their_upper_bound():
+    histogram = Histogram(n_buckets=8)
+    for value in (0, 0.5, 1, 1.9, 3, 4, 7.9, 100, 10 ** 6):
+        histogram.add(value)
+    assert histogram.to_dict()['buckets'] == {1: 2, 2: 2, 4: 1, 8: 2, 128: 2}
+    assert histogram.count == 9 and histogram.max == 10 ** 6
+
+    histogram.reset()
+    assert histogram.to_dict() == {'count': 0, 'mean': 0.0, 'max': 0, 'buckets': {}}
+
+
+class Policy:
+    """ The attributes of a routing policy read by the metrics """
+
+    def __init__(self):
+        self.simulator = types.SimpleNamespace(cur_step=0)
+        self.count_exploration = self.count_exploitation = 0
+        self.known_drones = np.array([0, 2, 4])
+        self.q_table = np.zeros((3, 5))
+        self.already_taken_actions, self.store_timestep_id_event = {}, {}
+        self.expiry = EventExpiry(event_duration=10)
+
+    def relay_selection(self, opt_neighbors, pkd):
+        self.count_exploitation += 1
+        return opt_neighbors[0]
+
+    def relay_selection_batch(self, opt_neighbors, packets):
+        return [self.relay_selection(opt_neighbors, pkd) for pkd in packets]
+
+    def feedback(self, drone, id_event, delay, outcome):
+        pass
+
+
+def test_records_of_each_period(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    policy = Policy()
+    metrics = RoutingMetrics(path, period=10)
+    metrics.attach(policy)
+    for step in range(25):
+        policy.simulator.cur_step = step
+        policy.count_exploration += step % 5 == 0
+        if step == 12:
+            policy.expiry.drop(1, pending=3, cur_step=step)
+        assert policy.relay_selection(['relay'], None) == 'relay'
+        policy.feedback('relay', step, delay=step, outcome=1)
+    metrics.close(policy)
+
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [record['step'] for record in records] == [10, 20, 24]
+    assert [record['latency_us']['count'] for record in records] == [11, 10, 4]
+    assert [record['feedback_delay']['count'] for record in records] == [10, 10, 5]
+    assert [record['dropped_feedback'] for record in records] == [0, 3, 0]
+    assert records[0]['exploration_ratio'] == 3 / 14
+    assert records[0]['known_drones_per_cell'] == {'mean': 3.0, 'max': 4}
+    assert records[0]['policy'] == 'Policy'
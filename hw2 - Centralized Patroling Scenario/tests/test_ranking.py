@@ -0,0 +1,38 @@
+import numpy as np
+
+from src.routing_algorithms.ranking import RelayRanking
+
+
+def test_best_and_ranked_follow_the_keys():
+    rnd = np.random.RandomState(4)
+    ranking = RelayRanking()
+    keys, orders = {}, {}  # (cell, drone id) -> current key, order of the first key
+    for _ in range(3000):
+        cell, drone_id = rnd.randint(0, 3), rnd.randint(0, 12)
+        key = None if rnd.random_sample() < 0.2 else float(rnd.randint(0, 6))  # repeated keys make ties
+        order = orders.setdefault((cell, drone_id), len(orders))
+        ranking.update(cell, drone_id, key, order)
+        if key is None:
+            keys.pop((cell, drone_id), None)
+        else:
+            keys[cell, drone_id] = key
+
+        # brute force: the drones of the cell sorted by key and order
+        expected = sorted((k, orders[c, d], d) for (c, d), k in keys.items() if c == cell)
+        assert ranking.ranked(cell) == [d for _, _, d in expected]
+        candidates = set(rnd.choice(12, size=rnd.randint(0, 6), replace=False).tolist())
+        best = next((d for _, _, d in expected if d in candidates), None)
+        assert ranking.best(cell, candidates) == best
+
+    # the invalid entries are dropped, the heaps stay bounded
+    for cell, heap in ranking.heaps.items():
+        assert len(heap) <= 2 * len(ranking.keys[cell]) + 16
+
+
+def test_unknown_cell():
+    ranking = RelayRanking()
+    assert ranking.best(5, {1, 2}) is None
+    assert ranking.ranked(5) == []
+    ranking.update(5, 1, 3.0, 0)
+    ranking.update(5, 1, None, 0)
+    assert ranking.best(5, {1}) is None and ranking.ranked(5) == []
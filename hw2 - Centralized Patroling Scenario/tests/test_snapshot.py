@@ -0,0 +1,62 @@
+import importlib
+import types
+
+import numpy as np
+import pytest
+
+# the routing classes import the simulator and matplotlib, without them the tests are skipped
+pytest.importorskip('src.utilities')
+pytest.importorskip('src.routing_algorithms.BASE_routing')
+pytest.importorskip('matplotlib')
+
+N_DRONES = 6
+
+
+def _policy(module: str, name: str, n_cells: int, seed: int):
+    """ A policy with the state read and written by the snapshot methods, the q table filled at random """
+    cls = getattr(importlib.import_module('src.routing_algorithms.' + module), name)
+    policy = cls.__new__(cls)
+    policy.simulator = types.SimpleNamespace(n_drones=N_DRONES, event_duration=200)
+    rnd = np.random.RandomState(seed)
+    known = rnd.random_sample((n_cells, N_DRONES)) < 0.5
+    if name == 'AI':
+        policy.q_table = np.where(known, rnd.randint(1, 200, size=known.shape), np.inf)
+    else:
+        policy.q_table = np.where(known, rnd.random_sample(known.shape), policy.initial_q_value)
+        policy.q_known = known
+    policy.known_drones = known.sum(axis=1)
+    policy.feedback_order = rnd.randint(0, N_DRONES, size=known.shape)
+    policy._build_ranking()
+    return policy
+
+
+@pytest.mark.parametrize('module, name', [('ai', 'AI'), ('q-learning', 'QLEARNING')])
+def test_snapshot_round_trip(tmp_path, module, name):
+    path = str(tmp_path / 'q.npz')
+    saved = _policy(module, name, n_cells=20, seed=1)
+    saved._save_snapshot(path)
+
+    # the run that loads the snapshot has a larger area, the q table grows to it
+    loaded = _policy(module, name, n_cells=30, seed=2)
+    loaded._load_snapshot(path)
+    assert np.array_equal(loaded.q_table[:20], saved.q_table)
+    assert np.array_equal(loaded.known_drones[:20], saved.known_drones)
+    assert np.array_equal(loaded.feedback_order[:20], saved.feedback_order)
+    assert len(loaded.q_table) >= 30
+    assert loaded.epsilon == loaded.warm_start_epsilon
+    for cell in range(30):
+        assert loaded.ranking.ranked(cell) == saved.ranking.ranked(cell)
+
+
+def test_snapshot_of_another_fleet_is_ignored(tmp_path):
+    path = str(tmp_path / 'q.npz')
+    saved = _policy('ai', 'AI', n_cells=20, seed=1)
+    saved.q_table = np.full((20, N_DRONES + 1), np.inf)
+    saved.feedback_order = np.zeros((20, N_DRONES + 1), dtype=np.int64)
+    saved._save_snapshot(path)
+
+    loaded = _policy('ai', 'AI', n_cells=20, seed=2)
+    q_table = loaded.q_table
+    loaded._load_snapshot(path)
+    assert loaded.q_table is q_table
+    assert loaded.epsilon == type(loaded).epsilon
@@ -0,0 +1,45 @@
+import collections
+
+import pytest
+
+from src.routing_algorithms.sweep import grid_configs, rank, successive_halving
+
+
+def evaluate(config: dict, len_simulation: int, seed: int) -> dict:
+    # imported by the workers as test_sweep:evaluate, a higher alpha is a better configuration
+    return {'delivery_ratio': config['alpha'], 'mean_delay': 100 - config['alpha'] * 10 + seed}
+
+
+def test_grid_configs():
+    assert grid_configs({'alpha': [0.1, 0.5], 'epsilon': [0.9]}) == [{'alpha': 0.1, 'epsilon': 0.9},
+                                                                     {'alpha': 0.5, 'epsilon': 0.9}]
+
+
+def test_rank_by_the_sum_of_the_positions():
+    results = [{'delivery_ratio': 0.5, 'mean_delay': 10}, {'delivery_ratio': 0.9, 'mean_delay': 30},
+               {'delivery_ratio': 0.7, 'mean_delay': 20}]
+    assert [r['delivery_ratio'] for r in rank(results)] == [0.9, 0.7, 0.5]
+
+
+@pytest.mark.parametrize('n_configs, min_len, max_len, eta, rungs', [
+    (9, 100, 900, 3, [(100, 6), (300, 2), (900, 1)]),
+    (9, 100, 1000, 3, [(100, 6), (300, 2), (1000, 1)]),  # the last rung runs the full length
+    (10, 100, 799, 2, [(100, 5), (200, 3), (799, 2)]),  # the third rung runs the full length instead of 400
+    (4, 500, 400, 3, [(400, 4)]),  # min_len above max_len, a single rung
+])
+def test_successive_halving_rungs(n_configs, min_len, max_len, eta, rungs):
+    configs = [{'policy': 'QLEARNING', 'alpha': i / n_configs} for i in range(n_configs)]
+    report = successive_halving('test_sweep:evaluate', configs, min_len, max_len, eta, seeds=[0, 1], workers=2)
+    assert len(report) == n_configs
+    # each configuration is reported once, at the last rung it reached
+    assert sorted(r['config']['alpha'] for r in report) == sorted(c['alpha'] for c in configs)
+    counts = collections.Counter((r['len_simulation'], r['rung']) for r in report)
+    assert [(length, counts[length, rung]) for rung, (length, _) in enumerate(rungs)] == rungs
+    # the best configuration goes through all the rungs and comes first
+    assert report[0]['config'] == configs[-1] and report[0]['len_simulation'] == max_len
+    assert report[0]['mean_delay'] == 100 - configs[-1]['alpha'] * 10 + 0.5
+
+
+def test_successive_halving_needs_eta_of_two():
+    with pytest.raises(ValueError):
+        successive_halving('test_sweep:evaluate', [{'alpha': 0}], 100, 900, eta=1)
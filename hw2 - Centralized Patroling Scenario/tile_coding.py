@@ -0,0 +1,157 @@
+from typing import Set
+
+import numpy as np
+from src.routing_algorithms.BASE_routing import BASE_routing
+from src.routing_algorithms.buffered_random import BufferedRandom
+from src.routing_algorithms.expiry import EventExpiry
+
+"""
+Q-learning routing of drone zero with a linear function approximation of the q values instead of a table per cell.
+The state is the position of drone zero encoded by tile coding: n_tilings grids of tiles of side tile_size, each one
+shifted by a fraction of the tile, so the position activates one tile for each tiling and near positions share most
+of their tiles (and what they learned). The tiles are hashed in a table of memory_size rows, so the memory does not
+depend on the size of the area. The q value of a drone is the sum of its weights over the active tiles.
+"""
+
+
+class TileCodingQLEARNING(BASE_routing):
+    # hyperparameters, they can be overridden in a subclass (see sweep.py)
+    epsilon: float = 0.98  # we explore an already explored event with probability 1 - epsilon
+    alpha: float = 0.50  # learning rate, split among the active tiles
+    n_tilings: int = 8
+    tile_size_cells: float = 2  # side of a tile in number of cells (prob_size_cell)
+    memory_size: int = 4096  # rows of the hashed weights table
+    ttl_slack: float = 1.0  # event durations the bookkeeping of an event is kept after its deadline (see expiry.py)
+
+    def __init__(self, drone, simulator):
+        BASE_routing.__init__(self, drone, simulator)
+        # random generator
+        self.rnd_for_routing_ai = BufferedRandom(self.simulator.seed)
+
+        self.drone_zero = drone
+        self.tile_size: float = self.tile_size_cells * self.simulator.prob_size_cell
+        # shift of each tiling, a fraction of the tile along the diagonal
+        self.tiling_offsets = np.arange(self.n_tilings, dtype=np.float64) * (self.tile_size / self.n_tilings)
+        self.tiling_ids = np.arange(self.n_tilings, dtype=np.int64)
+
+        # hashed tile x drone id -> weight, and number of feedback received through the tile
+        self.weights = np.zeros((self.memory_size, self.simulator.n_drones), dtype=np.float64)
+        self.feedback_counts = np.zeros((self.memory_size, self.simulator.n_drones), dtype=np.int64)
+
+        self.tiles_cache: dict = {}  # coords of drone zero -> active tiles
+        self.tiles_cache_size: int = 100000
+
+        self.already_taken_actions = {}  # id_event (int) : {drone: active tiles when the drone was chosen}
+
+        self.expiry = EventExpiry(self.simulator.event_duration, self.ttl_slack)
+
+        # for metrics purpose
+        self.count_exploration: int = 0
+        self.count_exploitation: int = 0
+
+    def _active_tiles(self) -> np.ndarray:
+        '''
+        Return the rows of the weights table active in the position of drone zero, one for each tiling.
+        All the tilings are computed at once, and memoized since drone zero follows a stationary path.
+        '''
+        coords = (self.drone.coords[0], self.drone.coords[1])
+        tiles = self.tiles_cache.get(coords)
+        if tiles is None:
+            if len(self.tiles_cache) >= self.tiles_cache_size:
+                self.tiles_cache.clear()  # the path is not stationary, we avoid to grow forever
+            x = np.floor((coords[0] + self.tiling_offsets) / self.tile_size).astype(np.int64)
+            y = np.floor((coords[1] + self.tiling_offsets) / self.tile_size).astype(np.int64)
+            tiles = (self.tiling_ids * 73856093 ^ x * 19349663 ^ y * 83492791) % self.memory_size
+            self.tiles_cache[coords] = tiles
+        return tiles
+
+    def _evict_expired_events(self) -> None:
+        '''We remove the bookkeeping of the events whose ttl is over (see expiry.py)'''
+        for id_event in self.expiry.expired(self.simulator.cur_step):
+            self.expiry.drop(id_event, len(self.already_taken_actions.pop(id_event, {})), self.simulator.cur_step)
+
+    def _store_action(self, id_event: int, action, tiles: np.ndarray) -> None:
+        if id_event not in self.already_taken_actions:
+            self.already_taken_actions[id_event] = {}
+            self.expiry.track(id_event, self.simulator.cur_step)
+        # the drone gets the feedback of the first position in which it was chosen
+        self.already_taken_actions[id_event].setdefault(action, tiles)
+
+    def _best_relay(self, tiles: np.ndarray, neighbors: dict) -> int:
+        '''
+        Return the id of the neighbour with the highest q value in the position, None if no neighbour
+        ever had a feedback through the active tiles.
+        '''
+        ids = np.fromiter(neighbors, dtype=np.int64, count=len(neighbors))
+        q_values = self.weights[tiles].sum(axis=0)[ids]
+        known = self.feedback_counts[tiles].any(axis=0)[ids]
+        if not known.any():
+            return None
+        q_values[~known] = -np.inf
+        return int(ids[np.argmax(q_values)])
+
+    def feedback(self, drone, id_event, delay, outcome):
+
+        if drone == self.drone_zero:
+            # we skip all feedback related to drone zero
+            return None
+
+        reward = self.simulator.event_duration - delay
+
+        if id_event in self.already_taken_actions and drone in self.already_taken_actions[id_event]:
+            tiles = self.already_taken_actions[id_event].pop(drone)
+            if len(self.already_taken_actions[id_event]) == 0:
+                del self.already_taken_actions[id_event]
+
+            # gradient step of the linear approximation, all the active tiles get the same share of the error
+            q_value = self.weights[tiles, drone.identifier].sum()
+            self.weights[tiles, drone.identifier] += (self.alpha / self.n_tilings) * (reward - q_value)
+            self.feedback_counts[tiles, drone.identifier] += 1
+        else:
+            self.expiry.unknown_feedback(id_event)  # counted as late if we dropped the event too early
+
+    def relay_selection(self, opt_neighbors, pkd):
+        """ arg max q value over the neighbours, with the q values approximated over the position of drone zero """
+
+        self._evict_expired_events()
+
+        id_event: int = pkd.event_ref.identifier
+
+        id_set_neighbors: Set = {v[1] for v in opt_neighbors}  # set of drones
+
+        tiles = self._active_tiles()
+
+        neighbors = {d.identifier: d for d in id_set_neighbors}
+        best_id = self._best_relay(tiles, neighbors)
+
+        epsilon_choice: bool = self.rnd_for_routing_ai.random() > self.epsilon
+
+        we_do_exploration: bool = id_event in self.already_taken_actions
+
+        if best_id is None or (we_do_exploration and epsilon_choice):
+            self.count_exploration += 1
+            # exploration, we skip the drones that already have the event
+            set_id_drone_to_explore = id_set_neighbors
+            if id_event in self.already_taken_actions:
+                set_id_drone_to_explore = id_set_neighbors.difference(self.already_taken_actions[id_event])
+                if len(set_id_drone_to_explore) == 0:
+                    return None  # no action
+
+            action = self.rnd_for_routing_ai.choice(list(set_id_drone_to_explore))
+        else:
+            # exploitation
+            self.count_exploitation += 1
+            action = neighbors[best_id]
+
+        self._store_action(id_event=id_event, action=action, tiles=tiles)
+
+        return action
+
+    def print(self):
+        """
+            This method is called at the end of the simulation, can be usefull to print some
+                metrics about the learning process
+        """
+        print("weights", self.weights)
+        print("EXPLOITATION", self.count_exploitation)
+        print("EXPLORATION -> ", self.count_exploration)
@@ -0,0 +1,283 @@
+import argparse
+import collections
+import importlib
+import json
+import os
+import sys
+import time
+import types
+
+import numpy as np
+
+"""
+Offline slotted-ALOHA channel to evaluate the distributed MAC agents without the simulator.
+In each slot every drone generates a packet with probability load / n_drones, the drones with packets run their
+agent, and the depot receives a packet only if a single drone transmits in the slot, otherwise all the
+transmissions collide. Each transmitting agent gets feedback(bool, packet) in the same slot.
+Two engines:
+ - agents: the QL, NAIVE and BAD_GOOD classes run unchanged, one instance per drone
+ - fleet: the FleetEngine of fleet.py with the same rules, the drones are only numpy vectors
+We report throughput (delivered packets per slot), collision and idle rate and the time to convergence: the first
+slot from which 5 consecutive windows of 10 frames (at least 1000 slots) all deliver at least 90% of the final
+throughput (see convergence_slot).
+The evaluation runs at about 10^3 - 10^5 slots per second: the agents engine makes a Python call for each
+backlogged drone in each slot (about 50k slots/s with 10 drones, 1k with 500), the fleet engine is one numpy
+step per slot (20k - 90k slots/s).
+Run it from this folder, e.g.:
+    python channel.py --drones 10 100 500 --slots 100000 --load 0.8 --output channel_results.json
+"""
+
+AGENTS = {'QL': 'q-learning', 'NAIVE': 'naive', 'BAD_GOOD': 'bad_good'}
+FLEET_POLICIES = {'QL': 'ql', 'NAIVE': 'naive', 'BAD_GOOD': 'bad_good'}
+
+
+class StubPacket:
+
+    def __init__(self, identifier: int, time_step_creation: int):
+        self.identifier = identifier
+        self.time_step_creation = time_step_creation
+
+    def __repr__(self):
+        return "StubPacket(%d)" % self.identifier
+
+
+class StubDrone:
+
+    def __init__(self, identifier: int):
+        self.identifier = identifier
+        self.buffer = collections.deque()  # from oldest to newest
+
+    def all_packets(self) -> list:
+        return list(self.buffer)
+
+    def buffer_length(self) -> int:
+        return len(self.buffer)
+
+    # buffer-aware interface read by DroneBuffer, O(1) on the deque
+    def has_packets(self) -> bool:
+        return len(self.buffer) > 0
+
+    def peek_oldest(self):
+        return self.buffer[0]
+
+    def buffer_len(self) -> int:
+        return len(self.buffer)
+
+    def __repr__(self):
+        return "StubDrone(%d)" % self.identifier
+
+
+class StubDepot:
+
+    def __init__(self):
+        self.transmissions: list = []  # (drone, packet) sent in the current slot
+
+    def receive(self, drone, packet) -> None:
+        self.transmissions.append((drone, packet))
+
+
+class StubSimulator:
+    """ The attributes of the simulator read by the agents """
+
+    def __init__(self, seed: int, n_drones: int, len_simulation: int):
+        self.seed = seed
+        self.n_drones = n_drones
+        self.len_simulation = len_simulation
+        self.drones = [StubDrone(i) for i in range(n_drones)]
+        self.depot = StubDepot()
+        # shared by all the agents as in the simulator, the traffic is drawn from another seed so the two are not the same stream
+        self.rnd_routing = np.random.RandomState(seed + 1)
+
+
+def _install_stand_in_simulator() -> None:
+    """
+    Register the few simulator modules imported by the agents, if the simulator is not available.
+    src.mac_protocol points to this folder, so the agents import each other as they do in the simulator.
+    """
+    try:
+        importlib.import_module('src.utilities.config')
+        return
+    except ImportError:
+        pass
+
+    config = types.SimpleNamespace(MAC_PRINT_STATS=False)
+    modules = {'src': [], 'src.utilities': [], 'src.entities': [],
+               'src.mac_protocol': [os.path.dirname(os.path.abspath(__file__))],
+               'src.utilities.config': config, 'src.utilities.utilities': types.SimpleNamespace(),
+               'src.entities.uav_entities': types.SimpleNamespace(Drone=StubDrone, DataPacket=StubPacket)}
+    for name, content in modules.items():
+        module = types.ModuleType(name)
+        if isinstance(content, list):
+            module.__path__ = content
+        else:
+            module.__dict__.update(vars(content))
+        sys.modules[name] = module
+    sys.modules['src.utilities'].config = sys.modules['src.utilities.config']
+    sys.modules['src.utilities'].utilities = sys.modules['src.utilities.utilities']
+
+
+def _arrivals(rnd: np.random.RandomState, n_drones: int, n_slots: int, load: float):
+    """ Yield for each slot the ids of the drones that generate a packet, drawn in blocks of slots """
+    block = max(1, 2 ** 20 // n_drones)
+    for start in range(0, n_slots, block):
+        size = min(block, n_slots - start)
+        slots, drones = np.nonzero(rnd.random_sample((size, n_drones)) < load / n_drones)
+        bounds = np.searchsorted(slots, np.arange(size + 1)).tolist()
+        drones = drones.tolist()
+        for i in range(size):
+            yield drones[bounds[i]:bounds[i + 1]]
+
+
+def convergence_slot(successes: np.ndarray, window: int, tolerance: float = 0.1, hold: int = 5) -> int:
+    """
+    First slot from which the throughput reaches (1 - tolerance) of the final throughput (the mean of the last 20%
+    of the slots) and holds it: each of the hold consecutive windows of slots from there is above that level.
+    The windows can start in any slot, so the result is not rounded to the window. None if the run is too short
+    to tell or if the throughput never holds the level.
+    """
+    if len(successes) < 2 * hold * window:
+        return None
+    final = successes[-len(successes) // 5:].mean()
+    cumulative = np.concatenate(([0], np.cumsum(successes, dtype=np.int64)))
+    reached = (cumulative[window:] - cumulative[:-window]) >= (1 - tolerance) * final * window  # window from each slot
+    starts = len(reached) - (hold - 1) * window
+    held = reached[:starts].copy()
+    for i in range(1, hold):
+        held &= reached[i * window:i * window + starts]
+    slots = np.flatnonzero(held)
+    return int(slots[0]) if len(slots) > 0 else None
+
+
+def _report(policy: str, engine: str, n_drones: int, n_slots: int, load: float, generated: int,
+            successes: np.ndarray, collisions: int, idle: int, window: int, elapsed: float) -> dict:
+    return {'policy': policy,
+            'engine': engine,
+            'n_drones': n_drones,
+            'slots': n_slots,
+            'load': load,
+            'generated': generated,
+            'delivered': int(successes.sum()),
+            'throughput': float(successes.mean()),
+            'collision_rate': collisions / n_slots,
+            'idle_rate': idle / n_slots,
+            'convergence_slot': convergence_slot(successes, window),
+            'slots_per_second': n_slots / elapsed if elapsed > 0 else float('inf')}
+
+
+def run_agents(policy: str, n_drones: int, n_slots: int, load: float, seed: int = 0,
+               adaptive_frame: bool = False) -> dict:
+    """
+    Run one agent of the given class (QL, NAIVE or BAD_GOOD) for each drone on the channel.
+    With adaptive_frame the QL agents change their frame length, and they run also with an empty buffer
+    so that their shared frame schedule sees every slot.
+    """
+    agent_cls = getattr(importlib.import_module('src.mac_protocol.' + AGENTS[policy]), policy)
+    simulator = StubSimulator(seed, n_drones, n_slots)
+    agents = [agent_cls(drone, simulator) for drone in simulator.drones]
+    for agent in agents:
+        agent.adaptive_frame = adaptive_frame
+    drones, depot = simulator.drones, simulator.depot
+    rnd = np.random.RandomState(seed)
+
+    successes = np.zeros(n_slots, dtype=np.int8)
+    collisions = idle = generated = 0
+    backlogged = set()  # drones with packets, the agents of the others return without doing anything
+    start = time.perf_counter()
+    for cur_step, arrivals in enumerate(_arrivals(rnd, n_drones, n_slots, load)):
+        for i in arrivals:
+            drones[i].buffer.append(StubPacket(generated, cur_step))
+            backlogged.add(i)
+            generated += 1
+
+        for i in (range(n_drones) if adaptive_frame else sorted(backlogged)):  # in order of drone id
+            agents[i].run(cur_step)
+
+        transmissions = depot.transmissions
+        depot.transmissions = []
+        delivered = len(transmissions) == 1
+        if delivered:
+            drone, packet = transmissions[0]
+            drone.buffer.popleft()
+            if len(drone.buffer) == 0:
+                backlogged.discard(drone.identifier)
+            successes[cur_step] = 1
+        elif len(transmissions) > 1:
+            collisions += 1
+        else:
+            idle += 1
+        for drone, packet in transmissions:
+            agents[drone.identifier].feedback(delivered, packet)
+    elapsed = time.perf_counter() - start
+
+    return _report(policy, 'agents' if not adaptive_frame else 'agents-adaptive', n_drones, n_slots, load, generated, successes, collisions, idle,
+                   max(10 * agents[0].len_frame, 1000), elapsed)
+
+
+def run_fleet(policy: str, n_drones: int, n_slots: int, load: float, seed: int = 0) -> dict:
+    """ Run the FleetEngine with the rules of the given policy, buffers are packet counters """
+    fleet = importlib.import_module('src.mac_protocol.fleet')
+    engine = fleet.FleetEngine(n_drones, seed, FLEET_POLICIES[policy])
+    rnd = np.random.RandomState(seed)
+
+    buffers = np.zeros(n_drones, dtype=np.int64)
+    successes = np.zeros(n_slots, dtype=np.int8)
+    collisions = idle = generated = 0
+    start = time.perf_counter()
+    for cur_step, arrivals in enumerate(_arrivals(rnd, n_drones, n_slots, load)):
+        if arrivals:
+            np.add.at(buffers, arrivals, 1)
+            generated += len(arrivals)
+
+        transmitting = np.flatnonzero(engine.communicate(cur_step) & (buffers > 0))
+        if len(transmitting) == 1:
+            buffers[transmitting] -= 1
+            successes[cur_step] = 1
+        elif len(transmitting) > 1:
+            collisions += 1
+        else:
+            idle += 1
+            continue
+        engine.update(transmitting, np.full(len(transmitting), engine._get_time_slot(cur_step)),
+                      np.full(len(transmitting), len(transmitting) == 1))
+    elapsed = time.perf_counter() - start
+
+    return _report(policy, 'fleet', n_drones, n_slots, load, generated, successes, collisions, idle,
+                   max(10 * engine.len_frame, 1000), elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline slotted-ALOHA evaluation of the distributed MAC agents")
+    parser.add_argument('--drones', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--slots', type=int, default=100000)
+    parser.add_argument('--load', type=float, default=0.8, help="packets generated per slot by the whole fleet")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--policies', nargs='+', default=list(AGENTS), choices=list(AGENTS))
+    parser.add_argument('--engine', default='agents', choices=['agents', 'fleet'])
+    parser.add_argument('--adaptive-frame', action='store_true', help="adaptive frame length of the QL agents")
+    parser.add_argument('--output', default='channel_results.json')
+    args = parser.parse_args()
+
+    _install_stand_in_simulator()
+    if args.adaptive_frame and (args.engine != 'agents' or args.policies != ['QL']):
+        parser.error("--adaptive-frame needs --engine agents --policies QL")
+    run = run_agents if args.engine == 'agents' else run_fleet
+    results = []
+    for n_drones in args.drones:
+        for policy in args.policies:
+            if args.adaptive_frame:
+                result = run_agents(policy, n_drones, args.slots, args.load, args.seed, adaptive_frame=True)
+            else:
+                result = run(policy, n_drones, args.slots, args.load, args.seed)
+            results.append(result)
+            print("%-8s %-15s n_drones=%-5d throughput=%.3f collisions=%.3f idle=%.3f convergence=%-8s slots/s=%.0f" % (
+                policy, result['engine'], n_drones, result['throughput'], result['collision_rate'], result['idle_rate'],
+                result['convergence_slot'], result['slots_per_second']))
+
+    with open(args.output, 'w') as f:
+        json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'config': vars(args), 'results': results}, f,
+                  indent=2)
+    print("results saved in", args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import collections
+
+"""
+Buffer-aware view of a drone used by the MAC agents: has_packets(), peek_oldest() and buffer_len().
+The agents only need to know if the buffer is empty and which packet is the oldest, so we use the methods of the
+drone with the same name when it has them, and otherwise fall back to buffer_length() and all_packets().
+The methods are resolved once, when the view is created.
+In the fallback the view keeps its own index of the packets of the drone, from the oldest: the agents call remove()
+with the packets they delivered, and peek_oldest() reads all_packets() only when buffer_length() tells that packets
+arrived since the last peek, to append the new ones, or that some left the buffer out of the view (expired), to build
+the index again. has_packets(), called by the agents in every step, notes the packets that left in between.
+So a peek without changes is O(1) and does not read the buffer of the drone. As many packets expiring as arriving
+within the same step leave the length unchanged and are not seen: the simulator should then offer peek_oldest().
+"""
+
+
+class DroneBuffer():
+
+    def __init__(self, drone):
+        self.drone = drone
+        self.indexed: bool = getattr(drone, 'peek_oldest', None) is None  # the view keeps the index of the packets
+        self.has_packets = (not self.indexed and getattr(drone, 'has_packets', None)) or self._has_packets
+        self.peek_oldest = self._peek_oldest if self.indexed else drone.peek_oldest
+        self.buffer_len = getattr(drone, 'buffer_len', None) or drone.buffer_length
+
+        # index of the fallback: packets from the oldest, the removed ones are skipped when they reach the head
+        self.packets = collections.deque()
+        self.removed: set = set()  # ids of the removed packets still in the index
+        self.live: int = 0  # packets in the index not removed
+        self.length: int = 0  # length of the buffer the last time the view read it
+        self.stale: bool = False  # packets left the buffer out of the view, the index is built again
+
+    def _has_packets(self) -> bool:
+        length: int = self.drone.buffer_length()
+        if length < self.length:
+            self.stale = True
+        self.length = length
+        return length > 0
+
+    def _peek_oldest(self):
+        self._has_packets()  # notes the packets that left the buffer since the last read
+        if self.length != self.live or self.stale:
+            self._sync(self.length)
+        self._skip_removed()
+        return self.packets[0]
+
+    def _sync(self, length: int) -> None:
+        # packets arrived or expired out of the view: the new ones are appended to the index if the packets it
+        # has are still the oldest ones of the buffer, otherwise the index is built again
+        packets = self.drone.all_packets()
+        self._skip_removed()
+        if length > self.live and not self.stale and (self.live == 0 or packets[0] is self.packets[0]):
+            self.packets.extend(packets[self.live:])
+        else:
+            self.packets, self.removed = collections.deque(packets), set()
+        self.live, self.length, self.stale = length, length, False
+
+    def _skip_removed(self) -> None:
+        while self.packets and self.packets[0].identifier in self.removed:
+            self.removed.discard(self.packets.popleft().identifier)
+
+    def remove(self, packet) -> None:
+        """ The packet left the buffer of the drone, e.g. it was delivered """
+        if not self.indexed or self.live == 0:
+            return
+        if self.packets[0] is packet:
+            self.packets.popleft()
+        elif packet.identifier not in self.removed:
+            self.removed.add(packet.identifier)
+        else:
+            return
+        self.live -= 1
+        self.length -= 1
@@ -0,0 +1,186 @@
+import weakref
+
+import numpy as np
+from src.utilities import config
+from src.entities.uav_entities import Drone, DataPacket
+from src.mac_protocol.inflight import InFlightTable
+from src.mac_protocol.drone_buffer import DroneBuffer
+
+"""
+Fleet engine of the distributed MAC agents.
+The slot values of all the drones are kept in a single n_drones x len_frame matrix, so the decision of the whole
+fleet in a slot is one vectorized operation and the feedback of a slot is applied in one batched update.
+The rules are the ones of the agents in q-learning.py, naive.py and bad_good.py:
+ - ql: q value of the slot, updated with the ALOHA-Q formula, the drone communicates if it is >= 0
+ - naive: score of the slot, the drone communicates if it is >= 0. NAIVE.feedback tests the method _get_coin_toss
+   instead of calling it, so any feedback sets the score to 1000 and we keep that behavior
+ - bad_good: good and bad feedback counters of the slot, the drone communicates if good > bad and
+   it tosses a coin in the slots without feedback
+Each drone explores with probability epsilon, communicating u.a.r., as the single agents do.
+The random numbers come from one generator for the whole fleet, so the decisions follow the same distribution of
+the single agents but not the same sequence.
+"""
+
+POLICIES = ('ql', 'naive', 'bad_good')
+
+# simulator -> {policy: FleetEngine}, the engines shared by the agents of each simulation
+# the simulator is not modified, and its engines are dropped with it
+_engines = weakref.WeakKeyDictionary()
+
+
+class FleetEngine():
+
+    def __init__(self, n_drones: int, seed, policy: str = 'ql', len_frame: int = None):
+        if policy not in POLICIES:
+            raise ValueError("unknown policy %s, expected one of %s" % (policy, POLICIES))
+        self.policy = policy
+        self.n_drones = n_drones
+        self.rnd = np.random.RandomState(seed)
+
+        # Hyper parameters
+        self.alpha = 0.1
+        self.epsilon = 0.05
+        self.len_frame = len_frame if len_frame is not None else n_drones * 2
+
+        # drone x slot values: q values (ql), scores (naive), good and bad feedback (bad_good)
+        self.values = np.zeros((n_drones, self.len_frame), dtype=np.float64)
+        self.bad = np.zeros((n_drones, self.len_frame), dtype=np.int64) if policy == 'bad_good' else None
+
+        self.decision_step: int = None  # step of the last decision
+        self.decision: np.ndarray = np.zeros(n_drones, dtype=bool)  # communicate of each drone in decision_step
+
+        # feedback received since the last update: drone, slot, delivered
+        self.pending_drones: list = []
+        self.pending_slots: list = []
+        self.pending_feedback: list = []
+
+    def _get_time_slot(self, cur_step: int) -> int:
+        return cur_step % self.len_frame
+
+    def communicate(self, cur_step: int) -> np.ndarray:
+        """ Return for each drone True if it should communicate in this slot, computed once per step """
+        if self.decision_step == cur_step:
+            return self.decision
+        self.apply_feedback()
+
+        cur_slot = self._get_time_slot(cur_step)
+        draws = self.rnd.random_sample((2, self.n_drones))
+        explore = draws[0] < self.epsilon
+        coin = draws[1] > 0.5
+
+        if self.policy == 'bad_good':
+            good, bad = self.values[:, cur_slot], self.bad[:, cur_slot]
+            explore |= (good + bad) == 0  # no feedback yet for the slot
+            exploit = good > bad
+        else:
+            exploit = self.values[:, cur_slot] >= 0
+
+        self.decision = np.where(explore, coin, exploit)
+        self.decision_step = cur_step
+        return self.decision
+
+    def add_feedback(self, drone_id: int, slot: int, feedback: bool) -> None:
+        """ Queue the feedback of a packet sent by the drone in the slot, it is applied before the next decision """
+        self.pending_drones.append(drone_id)
+        self.pending_slots.append(slot)
+        self.pending_feedback.append(feedback)
+
+    def apply_feedback(self) -> None:
+        """ Apply all the queued feedback in one batched update """
+        if len(self.pending_drones) == 0:
+            return
+        drones = np.array(self.pending_drones, dtype=np.int64)
+        slots = np.array(self.pending_slots, dtype=np.int64)
+        feedback = np.array(self.pending_feedback, dtype=bool)
+        self.pending_drones, self.pending_slots, self.pending_feedback = [], [], []
+        self.update(drones, slots, feedback)
+
+    def update(self, drones: np.ndarray, slots: np.ndarray, feedback: np.ndarray) -> None:
+        """ Update the values of the (drone, slot) pairs with their feedback, in the order they are given """
+        if self.policy == 'bad_good':
+            np.add.at(self.values, (drones, slots), feedback)
+            np.add.at(self.bad, (drones, slots), ~feedback)
+        elif self.policy == 'naive':
+            self.values[drones, slots] = 1000
+        else:
+            reward = np.where(feedback, 1.0, -1.0)
+            # the ALOHA-Q update is not additive, a pair that appears more than once is updated in rounds
+            keys = drones * self.len_frame + slots
+            while len(keys) > 0:
+                _, first = np.unique(keys, return_index=True)
+                d, s = drones[first], slots[first]
+                self.values[d, s] += self.alpha * (reward[first] - self.values[d, s])
+                rest = np.ones(len(keys), dtype=bool)
+                rest[first] = False
+                drones, slots, reward, keys = drones[rest], slots[rest], reward[rest], keys[rest]
+
+
+class FleetMAC():
+    """
+    Agent of a single drone backed by the FleetEngine shared by the whole fleet, with the interface of QL,
+    NAIVE and BAD_GOOD. The first agent that runs in a step makes the decision of all the drones, the others only
+    read it, and the feedback is queued and applied in one batch at the next step.
+    """
+    policy = 'ql'
+
+    def __init__(self, drone, simulator):
+        self.simulator = simulator
+        self.drone = drone
+        self.buffer = DroneBuffer(drone)  # O(1) access to the buffer of the drone
+        self.print_stats = config.MAC_PRINT_STATS
+        self.last_feedback = None
+
+        # the engine is shared by all the agents of the simulation, one for each policy
+        engines: dict = _engines.setdefault(simulator, {})
+        if self.policy not in engines:
+            engines[self.policy] = FleetEngine(simulator.n_drones, simulator.seed, self.policy)
+        self.engine: FleetEngine = engines[self.policy]
+
+        self.taken_action = InFlightTable(max_age=10 * self.engine.len_frame)  # id_packets -> time slot, packets waiting for feedback
+
+    def communicate(self, cur_step: int) -> bool:
+        """ Return the True if the drone should communicate in this slot, False otherwise """
+        return bool(self.engine.communicate(cur_step)[self.drone.identifier])
+
+    def feedback(self, feedback: bool, packet):
+        """
+        The method is called automatically to notify the status of tha last packet delivered, for simplicity
+            we add also the referred packet in the feedback.
+        """
+        if feedback:
+            self.buffer.remove(packet)  # the delivered packet left the buffer of the drone
+        slot: int = self.taken_action.pop(packet.identifier)
+        if slot is None:
+            return  # the packet is no longer in flight
+        self.engine.add_feedback(self.drone.identifier, slot, feedback)
+
+        if self.print_stats:
+            print(packet, feedback)
+
+    def run(self, cur_step: int):
+        """ run the mac and allocate bandwidth to a particual drone """
+        # the decision is made for the whole fleet, also for this drone if its buffer is empty
+        communicate = self.communicate(cur_step)
+        if not communicate or not self.buffer.has_packets():
+            return
+
+        # We select the oldest packet
+        oldest_packet: DataPacket = self.buffer.peek_oldest()
+        self.taken_action.add(oldest_packet.identifier, self.engine._get_time_slot(cur_step), cur_step)
+
+        self.simulator.depot.receive(self.drone, oldest_packet)
+        if self.print_stats:
+            print("Transmission for drone: ", self.drone.identifier, " to depot, ",
+                  self.buffer.buffer_len(), " in the buffer.")
+
+
+class FleetQL(FleetMAC):
+    policy = 'ql'
+
+
+class FleetNAIVE(FleetMAC):
+    policy = 'naive'
+
+
+class FleetBAD_GOOD(FleetMAC):
+    policy = 'bad_good'
@@ -0,0 +1,60 @@
+import weakref
+
+"""
+Frame schedule shared by the QL agents of a simulation in adaptive frame mode.
+Every drone on a slotted channel hears the outcome of each slot: idle (nobody transmits), success or collision.
+The schedule counts the collisions from the transmissions of all the agents, so every drone sees the same signal
+and takes the same decision: every adapt_frames frames, at the boundary of a frame, the frame doubles if too many
+slots collide. The agents read the length and the origin of the frame from the schedule and remap their q table
+when they change, so all the frames stay aligned.
+The frame does not shrink: the idle slots of a light load come from the missing traffic and not from a long frame,
+and halving the frame on them lowered the throughput on the offline channel (channel.py --adaptive-frame).
+Even growing it gives no consistent gain there, between -0.005 and +0.01 of throughput from 10 to 60 drones,
+so the adaptive frame stays an opt-in experiment of the QL agent.
+"""
+
+# simulator -> FrameSchedule, the schedule shared by the agents of each simulation
+_schedules = weakref.WeakKeyDictionary()
+
+
+def frame_schedule(simulator, len_frame: int, max_frame: int):
+    """ Return the schedule of the simulation, created by the first agent that asks for it """
+    if simulator not in _schedules:
+        _schedules[simulator] = FrameSchedule(len_frame, max_frame)
+    return _schedules[simulator]
+
+
+class FrameSchedule():
+
+    def __init__(self, len_frame: int, max_frame: int, adapt_frames: int = 16):
+        self.len_frame = len_frame
+        self.frame_origin: int = 0  # step in which the current frame length started
+        self.max_frame = max_frame
+        self.adapt_frames = adapt_frames  # frames observed before a change
+        self.grow_collision_rate = 0.3  # grow if more slots than this collide
+
+        self.step: int = None  # step of the slot being observed
+        self.transmissions: int = 0  # transmissions in the slot being observed
+        self.slots = self.collisions = 0  # outcomes of the slots since the last decision
+
+    def observe(self, cur_step: int) -> None:
+        """ Called by each agent at the beginning of its step, the first call of a step closes the previous slot """
+        if cur_step == self.step:
+            return
+        if self.step is not None:
+            self.slots += 1
+            self.collisions += self.transmissions > 1
+        self.step, self.transmissions = cur_step, 0
+
+        if self.slots >= self.adapt_frames * self.len_frame and (cur_step - self.frame_origin) % self.len_frame == 0:
+            self._adapt(cur_step)
+
+    def transmit(self) -> None:
+        """ An agent transmits in the slot being observed """
+        self.transmissions += 1
+
+    def _adapt(self, cur_step: int) -> None:
+        if self.collisions > self.grow_collision_rate * self.slots and self.len_frame < self.max_frame:
+            self.len_frame = min(self.max_frame, self.len_frame * 2)
+            self.frame_origin = cur_step  # the new frame starts in this step
+        self.slots = self.collisions = 0
@@ -0,0 +1,73 @@
+"""
+Bounded table of the packets in flight of a drone: packet id -> slot in which the packet was sent.
+Entries are kept in a ring buffer in order of transmission, with a dict from packet id to position in the ring.
+An entry leaves the table when its feedback arrives, when it is older than max_age steps, or when the ring is full
+and a new packet is sent (the oldest entry is dropped), so the memory of a drone does not grow with the packets sent.
+"""
+
+
+class InFlightTable():
+
+    def __init__(self, capacity: int = 1024, max_age: int = None):
+        self.capacity = capacity
+        self.max_age = max_age  # steps after which an entry without feedback is dropped, None to keep it
+
+        # ring buffer, an id -1 marks a free position (feedback received or entry dropped)
+        self.ids: list = [-1] * capacity
+        self.slots: list = [0] * capacity
+        self.steps: list = [0] * capacity
+        self.position: dict = {}  # id packet -> position in the ring
+        self.head: int = 0  # next position to write
+        self.used: int = 0  # positions from the oldest entry to head, free positions in between included
+
+    def __len__(self) -> int:
+        return len(self.position)
+
+    def __contains__(self, id_packet: int) -> bool:
+        return id_packet in self.position
+
+    def _drop_oldest(self) -> None:
+        tail = (self.head - self.used) % self.capacity
+        if self.ids[tail] != -1:
+            del self.position[self.ids[tail]]
+            self.ids[tail] = -1
+        self.used -= 1
+
+    def _age_out(self, cur_step: int) -> None:
+        # free positions at the tail are reclaimed, as the entries older than max_age
+        while self.used > 0:
+            tail = (self.head - self.used) % self.capacity
+            if self.ids[tail] != -1 and (self.max_age is None or cur_step - self.steps[tail] <= self.max_age):
+                break
+            self._drop_oldest()
+
+    def add(self, id_packet: int, slot: int, cur_step: int) -> None:
+        """ Store the slot of a packet sent in cur_step, a packet sent again keeps only its last slot """
+        self._age_out(cur_step)
+        if id_packet in self.position:
+            self.ids[self.position[id_packet]] = -1
+        if self.used == self.capacity:
+            self._drop_oldest()
+
+        self.ids[self.head] = id_packet
+        self.slots[self.head] = slot
+        self.steps[self.head] = cur_step
+        self.position[id_packet] = self.head
+        self.head = (self.head + 1) % self.capacity
+        self.used += 1
+
+    def pop(self, id_packet: int) -> int:
+        """ Remove a packet and return its slot, None if the packet is not in flight (unknown or dropped) """
+        position = self.position.pop(id_packet, None)
+        if position is None:
+            return None
+        self.ids[position] = -1
+        return self.slots[position]
+
+    def remap_slots(self, remap) -> None:
+        """ Replace the slot of every packet in flight with remap(slot), e.g. when the frame length changes """
+        for position in self.position.values():
+            self.slots[position] = remap(self.slots[position])
+
+    def slots_in_flight(self) -> set:
+        return {self.slots[position] for position in self.position.values()}
@@ -1,6 +1,8 @@
 from src.utilities import utilities as util
 from src.utilities import config
 from src.entities.uav_entities import Drone, DataPacket
+from src.mac_protocol.inflight import InFlightTable
+from src.mac_protocol.drone_buffer import DroneBuffer
 
 """
 The class is responsable to allocate communication resources to neighbors drones that want to offload data to the depot.
@@ -13,6 +15,7 @@ class NAIVE():
     def __init__(self, drone, simulator):
         self.simulator = simulator
         self.drone = drone
+        self.buffer = DroneBuffer(drone)  # O(1) access to the buffer of the drone
         self.print_stats = config.MAC_PRINT_STATS
         self.last_feedback = None
 
@@ -26,7 +29,8 @@ class NAIVE():
         self.coin_toss = 0.5
 
         # Data structure for the action taken and for the Q_Table
-        self.taken_action = {}  # id_packets -> time slot
+        # id_packets -> time slot of the packets waiting for feedback, bounded (see inflight.py)
+        self.taken_action = InFlightTable(max_age=10 * self.len_frame)
         self.slot_score = {}
 
 
@@ -53,7 +57,11 @@ class NAIVE():
         :return:
         """
         id_packet: int = packet.identifier
-        slot: int = self.taken_action[id_packet]
+        if feedback:
+            self.buffer.remove(packet)  # the delivered packet left the buffer of the drone
+        slot: int = self.taken_action.pop(id_packet)
+        if slot is None:
+            return  # the packet is no longer in flight, e.g. dropped after max_age
 
         # We update the value of the slot w.r.t. the last feedback received
         if feedback:
@@ -68,8 +76,7 @@ class NAIVE():
 
     def run(self, cur_step: int):
         """ run the mac and allocate bandwidth to a particual drone """
-        packets_to_send = self.drone.all_packets()  # the packets are ordered, from oldest to newest
-        if len(packets_to_send) == 0:
+        if not self.buffer.has_packets():
             return
 
         cur_slot: int = self._get_time_slot(cur_step)
@@ -78,22 +85,18 @@ class NAIVE():
 
         communicate = self.communicate(cur_step)  # whether communicate or not
 
-        # pck <- packets_to_send.pick_packet()
-        # E.g., :
-        # oldest_packet = packets_to_send[0]
-        # newest_packet = packets_to_send[-1]
-
-        oldest_packet: DataPacket = packets_to_send[0]
-
         if communicate:
 
+            # We select the oldest packet, the packets are ordered from oldest to newest
+            oldest_packet: DataPacket = self.buffer.peek_oldest()
+
             id_packet: int = oldest_packet.identifier
-            self.taken_action[id_packet] = cur_slot
+            self.taken_action.add(id_packet, cur_slot, cur_step)
 
             self.simulator.depot.receive(self.drone, oldest_packet)
             if self.print_stats:
                 print("Transmission for drone: ", self.drone.identifier, " to depot, ",
-                      len(packets_to_send), " in the buffer.")
+                      self.buffer.buffer_len(), " in the buffer.")
 
     # Function that identify the current slot
     def _get_time_slot(self, cur_step: int) -> int:
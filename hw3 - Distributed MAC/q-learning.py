@@ -1,6 +1,9 @@
 from src.utilities import utilities as util
 from src.utilities import config
 from src.entities.uav_entities import Drone, DataPacket
+from src.mac_protocol.inflight import InFlightTable
+from src.mac_protocol.drone_buffer import DroneBuffer
+from src.mac_protocol.frame_schedule import frame_schedule
 
 """
 The class is responsable to allocate communication resources to neighbors drones that want to offload data to the depot.
@@ -12,6 +15,7 @@ class QL():
     def __init__(self, drone, simulator):
         self.simulator = simulator
         self.drone = drone
+        self.buffer = DroneBuffer(drone)  # O(1) access to the buffer of the drone
         self.print_stats = config.MAC_PRINT_STATS
         self.last_feedback = None
 
@@ -24,8 +28,16 @@ class QL():
         self.epsilon = 0.05
         self.len_frame = self.n_drones * 2
 
+        # Adaptive frame: the length of the frame follows the schedule shared by the agents of the simulation
+        # (see frame_schedule.py), the q_table is remapped on the new frame
+        self.adaptive_frame = False
+        self.max_frame = self.n_drones * 4
+        self.frame_origin = 0  # step in which the current frame started
+        self.schedule = None
+
         # Data structure for the action taken and for the Q_Table
-        self.taken_action = {}  # id_packets -> time slot
+        # id_packets -> time slot of the packets waiting for feedback, bounded (see inflight.py)
+        self.taken_action = InFlightTable(max_age=10 * self.len_frame)
         self.q_table = {}
 
 
@@ -53,7 +65,11 @@ class QL():
         :return:
         """
         id_packet: int = packet.identifier
-        slot: int = self.taken_action[id_packet]
+        if feedback:
+            self.buffer.remove(packet)  # the delivered packet left the buffer of the drone
+        slot: int = self.taken_action.pop(id_packet)
+        if slot is None:
+            return  # the packet is no longer in flight, e.g. dropped after max_age
 
         reward: int = 1 if feedback else -1
 
@@ -66,8 +82,10 @@ class QL():
 
     def run(self, cur_step: int):
         """ run the mac and allocate bandwidth to a particual drone """
-        packets_to_send = self.drone.all_packets()  # the packets are ordered, from oldest to newest
-        if len(packets_to_send) == 0:
+        if self.adaptive_frame:
+            self._adapt_frame(cur_step)
+
+        if not self.buffer.has_packets():
             return
 
         cur_slot: int = self._get_time_slot(cur_step)
@@ -76,27 +94,53 @@ class QL():
 
         communicate = self.communicate(cur_step)  # whether communicate or not
 
-        # pck <- packets_to_send.pick_packet()
-        # E.g., :
-        # oldest_packet = packets_to_send[0]
-        # newest_packet = packets_to_send[-1]
-
-        # We select the oldest packet
-        oldest_packet: DataPacket = packets_to_send[0]
-
         if communicate:
 
+            # We select the oldest packet, the packets are ordered from oldest to newest
+            oldest_packet: DataPacket = self.buffer.peek_oldest()
+
             id_packet: int = oldest_packet.identifier
-            self.taken_action[id_packet] = cur_slot
+            self.taken_action.add(id_packet, cur_slot, cur_step)
+            if self.adaptive_frame:
+                self.schedule.transmit()
 
             self.simulator.depot.receive(self.drone, oldest_packet)
             if self.print_stats:
                 print("Transmission for drone: ", self.drone.identifier, " to depot, ",
-                      len(packets_to_send), " in the buffer.")
+                      self.buffer.buffer_len(), " in the buffer.")
 
     # Function that identify the current slot
     def _get_time_slot(self, cur_step: int) -> int:
-        return cur_step % self.len_frame
+        return (cur_step - self.frame_origin) % self.len_frame
+
+    # Function that follows the frame of the shared schedule, it runs in every step also with an empty buffer
+    def _adapt_frame(self, cur_step: int):
+        if self.schedule is None:
+            self.schedule = frame_schedule(self.simulator, self.len_frame, self.max_frame)
+        self.schedule.observe(cur_step)
+        if self.schedule.frame_origin != self.frame_origin:
+            if self.schedule.len_frame != self.len_frame:
+                self._remap_frame(self.schedule.len_frame)
+            self.frame_origin = self.schedule.frame_origin
+
+    # Function that move the q values and the packets in flight on a frame of a different length
+    def _remap_frame(self, len_frame: int):
+        old_len_frame = self.len_frame
+        q_table = {}
+        for slot in range(len_frame):
+            # the new slot covers the same fraction of the frame of these old slots
+            first = slot * old_len_frame // len_frame
+            last = max(first + 1, (slot + 1) * old_len_frame // len_frame)
+            values = [self.q_table[old_slot] for old_slot in range(first, last) if old_slot in self.q_table]
+            if len(values) > 0:
+                q_table[slot] = sum(values) / len(values)
+
+        self.taken_action.remap_slots(lambda slot: slot * len_frame // old_len_frame)
+        for slot in self.taken_action.slots_in_flight():
+            q_table.setdefault(slot, 0)  # the feedback of a packet in flight needs its slot
+        self.q_table = q_table
+        self.len_frame = len_frame
+        self.taken_action.max_age = 10 * len_frame  # the feedback can wait as many frames as before
 
     # Function that define the exploration/exploitation step
     def _get_exploration_step(self) -> bool:
@@ -0,0 +1,49 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+"""
+The tests run without the simulator: the stand-in of channel.py registers this folder as src.mac_protocol.
+The folders of the homeworks map src.mac_protocol to different files, so the src modules of this folder are kept
+apart and put back in sys.modules for each of its tests.
+"""
+
+FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _src_modules() -> dict:
+    return {name: module for name, module in sys.modules.items() if name == 'src' or name.startswith('src.')}
+
+
+def _install() -> dict:
+    for name in _src_modules():
+        del sys.modules[name]
+    spec = importlib.util.spec_from_file_location('hw3_channel', os.path.join(FOLDER, 'channel.py'))
+    channel = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(channel)
+    channel._install_stand_in_simulator()
+    return _src_modules()
+
+
+SRC = _install()
+
+
+def pytest_itemcollected(item):
+    # the modules imported by the tests of this folder while they are collected
+    SRC.update(_src_modules())
+
+
+@pytest.fixture(autouse=True)
+def src_modules():
+    """ The src modules of this folder during each test, the modules imported by the test are kept """
+    others = _src_modules()
+    for name in others:
+        del sys.modules[name]
+    sys.modules.update(SRC)
+    yield
+    SRC.update(_src_modules())
+    for name in _src_modules():
+        del sys.modules[name]
+    sys.modules.update(others)
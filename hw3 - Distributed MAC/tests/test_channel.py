@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from src.mac_protocol.channel import convergence_slot, run_agents, run_fleet
+
+
+def test_convergence_slot_of_a_step():
+    successes = np.concatenate((np.zeros(3000, dtype=np.int8), np.ones(7000, dtype=np.int8)))
+    # the window from slot 2990 already has 90 successes out of 100
+    assert convergence_slot(successes, window=100) == 2990
+    assert convergence_slot(successes, window=100, tolerance=0) == 3000
+
+
+def test_convergence_slot_needs_the_level_held():
+    successes = np.tile(np.repeat(np.array([1, 0], dtype=np.int8), 300), 20)
+    assert convergence_slot(successes, window=100) is None
+    assert convergence_slot(successes, window=100, hold=1) == 0
+    assert convergence_slot(np.ones(999, dtype=np.int8), window=100) is None  # shorter than 2 * hold windows
+
+
+@pytest.mark.parametrize('policy', ['QL', 'NAIVE', 'BAD_GOOD'])
+def test_runs_are_deterministic(policy):
+    for run in (run_agents, run_fleet):
+        first, second = run(policy, 8, 3000, 0.6, seed=2), run(policy, 8, 3000, 0.6, seed=2)
+        first.pop('slots_per_second'), second.pop('slots_per_second')
+        assert first == second
+        assert first['delivered'] <= first['generated']
+        assert first['delivered'] + round((first['collision_rate'] + first['idle_rate']) * 3000) == 3000
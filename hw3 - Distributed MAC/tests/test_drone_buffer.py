@@ -0,0 +1,61 @@
+import numpy as np
+
+from src.mac_protocol.channel import StubDrone, StubPacket
+from src.mac_protocol.drone_buffer import DroneBuffer
+
+
+class ListDrone:
+    """ A drone with only buffer_length() and all_packets(), as the simulator """
+
+    def __init__(self):
+        self.buffer = []
+        self.reads: int = 0  # calls of all_packets
+
+    def buffer_length(self) -> int:
+        return len(self.buffer)
+
+    def all_packets(self) -> list:
+        self.reads += 1
+        return list(self.buffer)
+
+
+def test_drone_methods_are_used_when_present():
+    drone = StubDrone(0)
+    view = DroneBuffer(drone)
+    assert not view.indexed
+    assert view.peek_oldest == drone.peek_oldest and view.has_packets == drone.has_packets
+
+
+def test_index_follows_the_buffer():
+    rnd = np.random.RandomState(9)
+    drone = ListDrone()
+    view = DroneBuffer(drone)
+    assert view.indexed
+    identifier = 0
+    for step in range(5000):
+        # in a step packets either arrive or expire, as many of both in the same step are not seen by the view
+        if rnd.random_sample() < 0.5:
+            for _ in range(rnd.randint(0, 3)):
+                drone.buffer.append(StubPacket(identifier, step))
+                identifier += 1
+        elif drone.buffer and rnd.random_sample() < 0.2:
+            del drone.buffer[rnd.randint(0, len(drone.buffer))]
+
+        assert view.has_packets() == (len(drone.buffer) > 0)
+        if drone.buffer and rnd.random_sample() < 0.7:
+            assert view.peek_oldest() is drone.buffer[0]
+            # the oldest packet is delivered, or a later one (e.g. a retransmission of the simulator)
+            packet = drone.buffer[0] if rnd.random_sample() < 0.8 else drone.buffer[-1]
+            drone.buffer.remove(packet)
+            view.remove(packet)
+
+
+def test_peek_without_changes_does_not_read_the_buffer():
+    drone = ListDrone()
+    view = DroneBuffer(drone)
+    drone.buffer.extend(StubPacket(i, 0) for i in range(5))
+    for packet in list(drone.buffer[:3]):
+        assert view.has_packets() and view.peek_oldest() is packet
+        drone.buffer.remove(packet)
+        view.remove(packet)
+    assert drone.reads == 1
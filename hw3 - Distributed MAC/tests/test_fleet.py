@@ -0,0 +1,52 @@
+import gc
+
+import numpy as np
+import pytest
+
+from src.mac_protocol import fleet
+from src.mac_protocol.channel import StubPacket, StubSimulator
+
+
+def test_engines_shared_within_a_simulation():
+    simulator, other = StubSimulator(0, 4, 100), StubSimulator(0, 4, 100)
+    agents = [fleet.FleetQL(drone, simulator) for drone in simulator.drones]
+    assert all(agent.engine is agents[0].engine for agent in agents)
+    assert fleet.FleetNAIVE(simulator.drones[0], simulator).engine is not agents[0].engine
+    assert fleet.FleetQL(other.drones[0], other).engine is not agents[0].engine
+
+    # the engines are dropped with their simulator
+    n_simulations = len(fleet._engines)
+    del simulator, agents
+    gc.collect()
+    assert len(fleet._engines) == n_simulations - 1
+
+
+def test_repeated_pairs_update_in_order():
+    engine, reference = fleet.FleetEngine(3, 0, 'ql', len_frame=4), fleet.FleetEngine(3, 0, 'ql', len_frame=4)
+    drones, slots = np.array([0, 1, 0, 0, 2]), np.array([1, 1, 1, 1, 3])
+    feedback = np.array([True, False, False, True, True])
+    engine.update(drones, slots, feedback)
+    for d, s, f in zip(drones, slots, feedback):
+        reference.update(np.array([d]), np.array([s]), np.array([f]))
+    assert np.array_equal(engine.values, reference.values)
+
+
+def test_feedback_is_applied_at_the_next_decision():
+    simulator = StubSimulator(1, 3, 100)
+    agent = fleet.FleetBAD_GOOD(simulator.drones[2], simulator)
+    packet = StubPacket(7, 0)
+    simulator.drones[2].buffer.append(packet)
+    agent.engine.decision_step, agent.engine.decision = 0, np.ones(3, dtype=bool)
+    agent.run(0)
+    assert simulator.depot.transmissions == [(simulator.drones[2], packet)]
+
+    agent.feedback(True, packet)
+    agent.feedback(True, packet)  # the packet is no longer in flight
+    assert agent.engine.values.sum() == 0
+    agent.communicate(1)
+    assert agent.engine.values[2, 0] == 1 and agent.engine.values.sum() == 1
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        fleet.FleetEngine(3, 0, 'aloha')
@@ -0,0 +1,55 @@
+import importlib
+
+from src.mac_protocol.channel import StubSimulator
+from src.mac_protocol.frame_schedule import FrameSchedule, frame_schedule
+
+
+def _observe(schedule: FrameSchedule, steps, transmissions: int) -> None:
+    for step in steps:
+        schedule.observe(step)
+        schedule.observe(step)  # the other agents of the step
+        for _ in range(transmissions):
+            schedule.transmit()
+
+
+def test_frame_doubles_on_collisions_up_to_max_frame():
+    schedule = FrameSchedule(4, 16, adapt_frames=2)
+    _observe(schedule, range(8), transmissions=2)
+    assert schedule.len_frame == 4
+    _observe(schedule, [8], transmissions=2)  # 8 slots observed, at a boundary of the frame
+    assert (schedule.len_frame, schedule.frame_origin) == (8, 8)
+    _observe(schedule, range(9, 25), transmissions=2)
+    assert (schedule.len_frame, schedule.frame_origin) == (16, 24)
+    _observe(schedule, range(25, 200), transmissions=2)
+    assert (schedule.len_frame, schedule.frame_origin) == (16, 24)
+
+
+def test_frame_stays_without_collisions():
+    schedule = FrameSchedule(4, 16, adapt_frames=2)
+    for step in range(200):
+        _observe(schedule, [step], transmissions=1 + (step % 5 == 0))  # 20% of the slots collide
+    assert (schedule.len_frame, schedule.frame_origin) == (4, 0)
+
+
+def test_agents_follow_the_shared_schedule():
+    ql = importlib.import_module('src.mac_protocol.q-learning')
+    simulator = StubSimulator(0, 2, 1000)
+    agents = [ql.QL(drone, simulator) for drone in simulator.drones]
+    for agent in agents:
+        agent.adaptive_frame = True
+        agent.q_table = {slot: 0.5 for slot in range(agent.len_frame)}
+    agents[0].taken_action.add(7, 3, cur_step=0)
+
+    for step in range(16 * 4 + 1):
+        for agent in agents:
+            agent._adapt_frame(step)
+        agents[0].schedule.transmit()
+        agents[1].schedule.transmit()
+
+    assert agents[0].schedule is agents[1].schedule is frame_schedule(simulator, 4, 8)
+    for agent in agents:
+        assert (agent.len_frame, agent.frame_origin) == (8, 64)
+        assert agent.taken_action.max_age == 80
+        assert agent._get_time_slot(64) == 0 and agent._get_time_slot(75) == 3
+    assert agents[0].taken_action.pop(7) == 6  # the slot of the packet in flight is on the new frame
+    assert agents[0].q_table == {slot: 0.5 for slot in range(8)}
@@ -0,0 +1,61 @@
+from src.mac_protocol.inflight import InFlightTable
+
+
+def test_pop_returns_the_slot_once():
+    table = InFlightTable(capacity=8)
+    table.add(10, 3, cur_step=0)
+    table.add(11, 5, cur_step=1)
+    assert 10 in table and len(table) == 2
+    assert table.pop(10) == 3
+    assert table.pop(10) is None and table.pop(99) is None
+    assert 10 not in table and len(table) == 1
+
+
+def test_entries_older_than_max_age_are_dropped():
+    table = InFlightTable(capacity=8, max_age=10)
+    table.add(1, 0, cur_step=0)
+    table.add(2, 1, cur_step=5)
+    table.add(3, 2, cur_step=10)  # the entry of step 0 is 10 steps old, still in flight
+    assert 1 in table
+    table.add(4, 3, cur_step=11)
+    assert table.pop(1) is None
+    assert [table.pop(i) for i in (2, 3, 4)] == [1, 2, 3]
+
+    table.add(5, 4, cur_step=100)
+    assert len(table) == 1 and table.used == 1  # the free positions at the tail are reclaimed
+
+
+def test_full_ring_drops_the_oldest():
+    table = InFlightTable(capacity=4)
+    for i in range(4):
+        table.add(i, i, cur_step=i)
+    table.add(4, 4, cur_step=4)
+    assert 0 not in table and len(table) == 4
+    assert table.pop(0) is None
+
+    # a free position in the middle still counts until it reaches the tail
+    assert table.pop(2) == 2
+    table.add(5, 5, cur_step=5)
+    assert sorted(table.position) == [3, 4, 5]
+    table.add(6, 6, cur_step=6)
+    assert sorted(table.position) == [3, 4, 5, 6]
+    for i in range(6, 1000):
+        table.add(i, i % 7, cur_step=i)
+    assert len(table) == 4 and len(table.ids) == 4
+    assert sorted(table.position) == [996, 997, 998, 999]
+
+
+def test_resent_packet_keeps_its_last_slot():
+    table = InFlightTable(capacity=4)
+    table.add(1, 2, cur_step=0)
+    table.add(1, 3, cur_step=4)
+    assert len(table) == 1 and table.pop(1) == 3
+
+
+def test_remap_slots():
+    table = InFlightTable(capacity=4)
+    for i in range(3):
+        table.add(i, i, cur_step=i)
+    table.pop(1)
+    table.remap_slots(lambda slot: slot * 2)
+    assert table.slots_in_flight() == {0, 4}